@@ -0,0 +1,325 @@
+import asyncio
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ASYNC_CONCURRENCY, SPECULATIVE_PAGES, MAX_PAGES, STOP_WHEN_ALL_SEEN, INCREMENTAL_CRAWL, LOW_MEMORY, TASK_MAX_RETRIES
+from app.crawler import generate_urls, fetch_page, fetch_first_page, parse_page, stop_reason, PaginationStats, parse_cache, page_slots
+from app.libs.page_cache import PageCache
+from app.libs.parsing import release_document
+from app.libs.utils import get_fetcher, load_pushed_ids
+from app.libs.metrics import metrics
+from app.libs.rate_limit import backoff_delay
+from app.libs.listing import merge_listing
+
+
+class _FetcherLocal(threading.local):
+    fetcher = None
+
+
+class AsyncCrawler:
+    """
+    asyncio crawl engine that fans out over every search URL and page at once.
+
+    Pages 1..SPECULATIVE_PAGES of each URL are requested up front instead of
+    being discovered one by one. As soon as a page turns out to be `.empty` or
+    stop_reason() says later pages cannot hold anything new, every later page
+    of that URL still pending is cancelled. A single semaphore caps in-flight fetches across all URLs.
+
+    A search the page cache has seen before may come back unchanged, which
+    skips it entirely, so its speculative pages only start once page 1 has
+    come back changed. A page that fails is retried up to `max_retries`
+    times on a fresh backend, like CrawlPool does.
+
+    Fetch backends are blocking, so they run on an executor sized to the
+    concurrency limit with one backend per executor thread.
+    """
+
+    def __init__(self, concurrency=ASYNC_CONCURRENCY, speculative_pages=SPECULATIVE_PAGES, max_pages=MAX_PAGES, pushed=None, cache=None, sessions=None,
+                 max_retries=TASK_MAX_RETRIES):
+        self.concurrency = max(1, concurrency)
+        self.speculative_pages = max(1, speculative_pages)
+        self.max_pages = max_pages
+        self.max_retries = max(0, max_retries)
+        self.pushed = pushed
+        self.cache = cache
+        self.sessions = sessions
+        self.stats = PaginationStats()
+        self.local = _FetcherLocal()
+        self.fetchers = []
+        self.lock = threading.Lock()
+
+    def _fetcher(self):
+        if self.local.fetcher is None:
+            self.local.fetcher = self.sessions.acquire() if self.sessions else get_fetcher()
+            with self.lock:
+                self.fetchers.append(self.local.fetcher)
+        return self.local.fetcher
+
+    def _drop_fetcher(self):
+        """Throw away this thread's backend after a failure, the next attempt starts a fresh one"""
+        fetcher, self.local.fetcher = self.local.fetcher, None
+        if fetcher is None:
+            return
+        with self.lock:
+            self.fetchers.remove(fetcher)
+        try:
+            if self.sessions:
+                self.sessions.discard(fetcher)
+            else:
+                fetcher.quit()
+        except Exception as e:
+            print(f"[Async] Failed to quit fetch backend: {str(e)}")
+
+    def _crawl_page_with_retries(self, url, page):
+        """_crawl_page(), retried on a fresh backend; raises once every attempt failed"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._crawl_page(url, page)
+            except Exception as e:
+                print(f"[Async] Failed on {url} page {page} (Attempt {attempt + 1}/{self.max_retries + 1}): {str(e)}")
+                self._drop_fetcher()
+                if attempt == self.max_retries:
+                    raise
+                metrics.incr("task_retries")
+                time.sleep(backoff_delay(attempt))
+
+    def _crawl_page(self, url, page):
+        """Blocking fetch + parse, runs on an executor thread"""
+        with page_slots:
+            if page == 1 and self.cache:
+                soup = fetch_first_page(self._fetcher(), url, self.cache)
+                if soup is None:
+                    return {}, True, "first page unchanged since last run"
+            else:
+                soup = fetch_page(self._fetcher(), url, page)
+            try:
+                items, has_listings = parse_page(soup, page, url)
+                reason = stop_reason(soup, self.pushed, url) if has_listings else None
+            finally:
+                if LOW_MEMORY:
+                    release_document(soup)
+        if not has_listings:
+            return items, True, None
+        return items, reason is not None, reason
+
+    async def _page(self, loop, executor, semaphore, url, page):
+        async with semaphore:
+            return await loop.run_in_executor(executor, self._crawl_page_with_retries, url, page)
+
+    async def crawl_url(self, loop, executor, semaphore, url, emit):
+        """
+        Crawl one search URL with speculative pagination.
+
+        A page is passed to emit() as soon as every page before it finished
+        without stopping, since only then is it certain to be kept.
+        """
+        tasks = {}
+        results = {}
+        stop_at = self.max_pages + 1
+        early_reason = None
+        next_page = 1
+        next_emit = 1
+        # Page 1 of a cached search may say nothing changed; speculating past it would waste those fetches
+        window = 1 if self.cache and self.cache.get(url) is not None else self.speculative_pages
+
+        while True:
+            # Keep a window of speculative pages in flight
+            while next_page < stop_at and next_page <= self.max_pages and len(tasks) < window:
+                tasks[next_page] = asyncio.ensure_future(self._page(loop, executor, semaphore, url, next_page))
+                next_page += 1
+
+            if not tasks:
+                break
+
+            done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+            for page in sorted(p for p, t in tasks.items() if t in done):
+                if page not in tasks:
+                    # Already dropped by an earlier stopping page in this batch
+                    continue
+                task = tasks.pop(page)
+                try:
+                    items, stop, reason = task.result()
+                except Exception as e:
+                    print(f"[Async] Giving up on {url} page {page}: {str(e)}")
+                    items, reason, stop = None, None, True
+                    if self.cache:
+                        self.cache.discard(url)
+
+                results[page] = items
+                if page == 1 and not stop:
+                    window = self.speculative_pages
+                if stop and page < stop_at:
+                    stop_at = page
+                    early_reason = reason
+                    for later, pending in list(tasks.items()):
+                        if later > page:
+                            pending.cancel()
+                            del tasks[later]
+
+            while next_emit in results and next_emit <= stop_at:
+                page_items = results.pop(next_emit)
+                if page_items:
+                    emit(page_items)
+                next_emit += 1
+
+        if early_reason and stop_at < self.max_pages:
+            print(f"[Async] Stop paging after page {stop_at}: {early_reason}")
+            self.stats.record(stop_at)
+        elif stop_at <= self.max_pages:
+            print(f"[Async] Stop after page {stop_at} for {url}")
+
+    async def crawl(self, urls, emit=None):
+        """
+        Crawl every URL.
+
+        Args:
+            emit (callable): Called on the event loop with each kept page's items,
+                defaults to merging them into the returned dict
+
+        Returns:
+            dict: Merged items, empty when `emit` is given
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        items = {}
+
+        def collect(page_items):
+            for listing in page_items.values():
+                merge_listing(items, listing)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                await asyncio.gather(
+                    *(self.crawl_url(loop, executor, semaphore, url, emit or collect) for url in urls)
+                )
+            finally:
+                executor.shutdown(wait=True)
+                for fetcher in self.fetchers:
+                    try:
+                        if self.sessions:
+                            self.sessions.release(fetcher)
+                        elif fetcher:
+                            fetcher.quit()
+                    except Exception as e:
+                        print(f"[Async] Failed to quit fetch backend: {str(e)}")
+                self.fetchers.clear()
+
+        return items
+
+    async def stream(self, urls):
+        """
+        Async iterator over listings as their pages are kept.
+
+        Yields:
+            Listing: Every listing of every kept page
+        """
+        pages = asyncio.Queue()
+        crawl = asyncio.ensure_future(self.crawl(urls, emit=pages.put_nowait))
+        crawl.add_done_callback(lambda _: pages.put_nowait(None))
+
+        while True:
+            page_items = await pages.get()
+            if page_items is None:
+                break
+            for listing in page_items.values():
+                yield listing
+        # Re-raise anything the crawl failed with
+        await crawl
+
+
+_DONE = object()
+
+
+def iter_async_crawler(sessions=None, urls=None, cache=None):
+    """
+    Blocking generator over AsyncCrawler.stream(), for the synchronous entry points.
+
+    The event loop runs on a background thread and hands listings over
+    through a queue. Errors are raised to the caller.
+
+    Args:
+        sessions (SessionManager): Reuse warm backends from this manager
+        urls (list): Search URLs to crawl, defaults to every generated URL
+        cache (PageCache): Page cache of the run, see crawler.iter_crawler()
+
+    Yields:
+        Listing: Every listing of every kept page
+    """
+    urls = generate_urls() if urls is None else urls
+    print(f"[Async] Start crawling {len(urls)} URLs, concurrency {ASYNC_CONCURRENCY}")
+    parse_cache.reset()
+    pushed = load_pushed_ids() if STOP_WHEN_ALL_SEEN else None
+    own_cache = cache is None and INCREMENTAL_CRAWL
+    if own_cache:
+        cache = PageCache()
+    crawler = AsyncCrawler(pushed=pushed, cache=cache, sessions=sessions)
+    listings = queue.Queue()
+
+    async def pump():
+        async for listing in crawler.stream(urls):
+            listings.put(listing)
+
+    def run_loop():
+        try:
+            asyncio.run(pump())
+            listings.put(_DONE)
+        except BaseException as e:
+            listings.put(e)
+
+    thread = threading.Thread(target=run_loop, daemon=True)
+    thread.start()
+    while True:
+        listing = listings.get()
+        if listing is _DONE:
+            break
+        if isinstance(listing, BaseException):
+            raise listing
+        yield listing
+    thread.join()
+
+    crawler.stats.report()
+    parse_cache.report()
+    parse_cache.reset()
+    if own_cache:
+        cache.commit()
+        cache.save()
+    print("[Async] Done.")
+
+
+def run_async_crawler(sessions=None, urls=None, cache=None):
+    """
+    Alternative entry point to run_crawler using the asyncio engine.
+
+    Args:
+        sessions (SessionManager): Reuse warm backends from this manager
+        urls (list): Search URLs to crawl, defaults to every generated URL
+        cache (PageCache): Page cache of the run, see crawler.iter_crawler()
+
+    Returns:
+        dict: Same items dict as run_crawler, or None on a critical failure
+    """
+    try:
+        urls = generate_urls() if urls is None else urls
+        print(f"[Async] Start crawling {len(urls)} URLs, concurrency {ASYNC_CONCURRENCY}")
+        parse_cache.reset()
+        pushed = load_pushed_ids() if STOP_WHEN_ALL_SEEN else None
+        own_cache = cache is None and INCREMENTAL_CRAWL
+        if own_cache:
+            cache = PageCache()
+        crawler = AsyncCrawler(pushed=pushed, cache=cache, sessions=sessions)
+        items = asyncio.run(crawler.crawl(urls))
+        crawler.stats.report()
+        parse_cache.report()
+        parse_cache.reset()
+        if own_cache:
+            cache.commit()
+            cache.save()
+        print("[Async] Done.")
+        return items
+    except Exception as e:
+        print(f"[Critical Error] Async crawler failed: {str(e)}")
+        traceback.print_exc()
+        return None
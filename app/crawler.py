@@ -1,18 +1,32 @@
-from datetime import datetime
-import time
-import sys
+from contextlib import nullcontext
+from concurrent.futures import Future
+from functools import partial
+from urllib.parse import urlsplit, parse_qsl
+import hashlib
+import threading
 import traceback
-from dotenv import load_dotenv
 
-from config import CITY_DISTRICTS, RENT_RANGE, MIN_PING, MAX_PING, KINDS, NEW_WITHIN_HOURS, GET_RECOMMENDS, GET_NORMAL, NOT_COVER, ALL_SEX, BOY_ONLY, SEARCH_MODE, METRO_STATIONS
-from app.line_notify import push_to_line
-from app.libs.utils import get_driver, get_page_content
+from config import GET_RECOMMENDS, GET_NORMAL, NOT_COVER, ALL_SEX, BOY_ONLY, PROFILES, CRAWLER_WORKERS, TASK_QUEUE_SIZE, TASK_MAX_RETRIES, MAX_PAGES, PAGINATION_CUTOFF_HOURS, STOP_WHEN_ALL_SEEN, INCREMENTAL_CRAWL, PARSE_PROCESSES, PARSE_QUEUE_SIZE, LOW_MEMORY, MAX_INFLIGHT_PAGES
+from app.libs.utils import get_fetcher, get_page_content, load_pushed_ids
+from app.libs.fetchers import NOT_MODIFIED
+from app.libs.page_cache import PageCache
+from app.libs.parse_pool import ParsePool
+from app.libs.parsing import parse_html, release_document
+from app.libs.metrics import metrics
+from app.libs.worker_pool import CrawlPool
+from app.libs.listing import Listing, merge_listing, listing_id, parse_price, parse_ping, parse_floor, kind_of
+from app.libs.profiles import load_profiles, merge_queries, search_window_hours
 
-load_dotenv()
+# Profiles may want older listings than the global settings, so parse and page for the widest of them
+LISTING_WINDOW_HOURS = search_window_hours()
+PAGINATION_WINDOW_HOURS = max(PAGINATION_CUTOFF_HOURS, LISTING_WINDOW_HOURS) if PROFILES else PAGINATION_CUTOFF_HOURS
 
-def generate_urls():
+def generate_urls(profiles=None):
     """
     Generate a list of URLs to scrape based on the configuration.
+
+    Every profile's search is merged into shared queries first (see
+    merge_queries), so a page several profiles need is fetched only once.
     """
     urls = []
 
@@ -20,24 +34,14 @@ def generate_urls():
     config = {
         "metro": {
             "base": "https://rent.591.com.tw/list?metro={main}&station={sub}&kind={kind}",
-            "data": METRO_STATIONS,
             "key_name": "metro"
         },
         "district": {
             "base": "https://rent.591.com.tw/list?region={main}&section={sub}&kind={kind}",
-            "data": CITY_DISTRICTS,
             "key_name": "region"
         }
     }
 
-    # 根據模式取出設定
-    mode_conf = config.get(SEARCH_MODE)
-    if not mode_conf:
-        raise ValueError(f"Invalid SEARCH_MODE: {SEARCH_MODE}")
-
-    # 預先組好共通查詢參數
-    common_params = f"&price={RENT_RANGE[0]}$_{RENT_RANGE[1]}$&acreage={MIN_PING}$_{MAX_PING}$&other=cook,newPost&sort=posttime_desc&option=washer"
-
     # notice 組合
     notice_flags = [
         flag for flag, enabled in [
@@ -49,53 +53,458 @@ def generate_urls():
     notice_param = f"&notice={','.join(notice_flags)}" if notice_flags else ""
 
     # 生成 URL
-    for main, subs in mode_conf["data"].items():
-        sub_param = ",".join(subs)
-        for kind in KINDS:
-            url = mode_conf["base"].format(main=main, sub=sub_param, kind=kind)
-            urls.append(url + common_params + notice_param)
+    for query in merge_queries(profiles or load_profiles()):
+        # 根據模式取出設定
+        mode_conf = config.get(query["mode"])
+        if not mode_conf:
+            raise ValueError(f"Invalid SEARCH_MODE: {query['mode']}")
+
+        rent_range, ping_range = query["rent_range"], query["ping_range"]
+        common_params = f"&price={rent_range[0]}$_{rent_range[1]}$&acreage={ping_range[0]}$_{ping_range[1]}$&other=cook,newPost&sort=posttime_desc&option=washer"
+        url = mode_conf["base"].format(main=query["main"], sub=",".join(query["subs"]), kind=query["kind"])
+        urls.append(url + common_params + notice_param)
+
+    return coalesce_urls(urls)
 
-    return urls
+def normalize_url(url):
+    """
+    Key under which two search URLs return the same pages.
+
+    Parameter order and the order inside comma-separated lists (stations,
+    sections, notice flags) do not change what 591 returns.
+    """
+    parts = urlsplit(url)
+    params = sorted((key, ",".join(sorted(value.split(",")))) for key, value in parse_qsl(parts.query, keep_blank_values=True))
+    return parts.netloc + parts.path + "?" + "&".join(f"{key}={value}" for key, value in params)
+
+def coalesce_urls(urls):
+    """
+    Drop URLs that normalize to one already in the list, keeping the first spelling.
+
+    The first spelling is kept as is, so page cache and schedule entries
+    stay keyed the same across runs.
+    """
+    unique = {}
+    for url in urls:
+        unique.setdefault(normalize_url(url), url)
+    coalesced = len(urls) - len(unique)
+    if coalesced:
+        print(f"[Crawler] Coalesced {coalesced} duplicate search URLs")
+        metrics.incr("urls_coalesced", coalesced)
+    return list(unique.values())
+
+def post_age_minutes(time_text):
+    """
+    Convert 591's relative post time (e.g. "5分鐘內更新", "3小時內更新", "2天內更新") to minutes.
+
+    Returns:
+        int: Age in minutes, or None if the text is not recognised
+    """
+    for unit, minutes in (("分鐘", 1), ("小時", 60), ("天", 60 * 24)):
+        if unit in time_text:
+            try:
+                return int(time_text.split(unit)[0].strip()) * minutes
+            except ValueError:
+                return None
+    return None
 
 def is_new_listing(time_text):
-    now = datetime.now()
-    if "分鐘" in time_text:
-        return True
-    if "小時" in time_text:
-        hour = int(time_text.split("小時")[0])
-        return hour <= NEW_WITHIN_HOURS
-    return False
-
-def run_crawler():
+    return is_within_window(post_age_minutes(time_text))
+
+def is_within_window(age_minutes):
+    """Whether a listing of this age is recent enough for any profile"""
+    return age_minutes is not None and age_minutes <= LISTING_WINDOW_HOURS * 60
+
+class ParseCache:
+    """
+    Listings already parsed this run, by ID.
+
+    Overlapping searches return many of the same listings. get_normal_items()
+    looks the ID up before extracting any other field and reuses the
+    Listing on a hit. reset() starts a new run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.listings = {}
+            self.hits = 0
+
+    def get(self, id, source_url=None):
+        """The listing parsed earlier this run, now also recorded as found on `source_url`, or None"""
+        with self.lock:
+            listing = self.listings.get(id)
+            if listing is not None:
+                self.hits += 1
+                listing.add_sources([source_url])
+        if listing is not None:
+            metrics.incr("parse_cache_hits")
+        return listing
+
+    def put(self, listing):
+        with self.lock:
+            self.listings.setdefault(listing.id, listing)
+
+    def report(self):
+        print(f"[Crawler] Parse cache reused {self.hits} already parsed listings")
+
+# Shared by every engine in this process, reset at the start of each run
+parse_cache = ParseCache()
+
+# Low-memory mode caps how many fetched pages (raw HTML or parse tree) are held at once
+page_slots = threading.BoundedSemaphore(max(1, MAX_INFLIGHT_PAGES)) if LOW_MEMORY else nullcontext()
+
+class PaginationStats:
+    """Thread-safe tally of pages skipped by early termination"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stopped_urls = 0
+        self.pages_saved = 0
+
+    def record(self, page):
+        with self.lock:
+            self.stopped_urls += 1
+            self.pages_saved += MAX_PAGES - page
+        metrics.incr("urls_stopped_early")
+        metrics.incr("pages_saved", MAX_PAGES - page)
+
+    def report(self):
+        print(f"[Crawler] Early termination on {self.stopped_urls} URLs saved up to {self.pages_saved} page loads")
+
+@metrics.timed("select_stop_reason")
+def stop_reason(soup, pushed=None, url=None):
+    """
+    Decide whether pagination can stop after this page.
+
+    Results are sorted by posttime_desc, so once the oldest listing on a page is
+    past the pagination window every later page is older still. Likewise a page
+    made only of already pushed IDs means later pages were seen in earlier runs.
+
+    Args:
+        pushed (PushedIds): IDs pushed to each profile, see load_pushed_ids()
+        url (str): Search URL of the page, which decides the profiles it is checked against
+
+    Returns:
+        str: Why paging should stop, or None to keep going
+    """
+    listings = soup.select('.item')
+    if not listings:
+        return None
+
+    ages = []
+    ids = []
+    for item in listings:
+        time_element = item.select_one("div.item-info-txt.role-name span.line")
+        age = post_age_minutes(time_element.text.strip()) if time_element else None
+        if age is not None:
+            ages.append(age)
+        link_element = item.select_one(".item-info-title a.link.v-middle")
+        id = listing_id(link_element.get('href')) if link_element else None
+        if id is not None:
+            ids.append(id)
+
+    if ages and max(ages) > PAGINATION_WINDOW_HOURS * 60:
+        return f"oldest listing is older than {PAGINATION_WINDOW_HOURS} hours"
+    if STOP_WHEN_ALL_SEEN and pushed and ids and pushed.all_pushed(url, ids):
+        return "every listing was already pushed"
+    return None
+
+def page_url(url, page):
+    return url if page == 1 else url + f'&page={page}'
+
+def fetch_page(fetcher, url, page):
+    """
+    Fetch page `page` of a search URL, raising so the caller can retry on failure.
+
+    Only one attempt is made here: the engines retry a failed page themselves
+    on a fresh backend (TASK_MAX_RETRIES / JOB_MAX_ATTEMPTS).
+    """
+    target = page_url(url, page)
+    soup = get_page_content(fetcher, target, max_retries=1)
+    if not soup:
+        raise RuntimeError(f"Failed to get content for URL: {target}")
+    return soup
+
+@metrics.timed("select_fingerprint")
+def page_fingerprint(soup):
+    """
+    Hash the set of normal listing IDs on a page.
+
+    Recommended listings rotate between requests, so they are left out.
+    """
+    ids = sorted(
+        id for id in (listing_id(a.get('href')) for a in soup.select(".item .item-info-title a.link.v-middle"))
+        if id is not None
+    )
+    return hashlib.sha1(",".join(map(str, ids)).encode()).hexdigest()
+
+def fetch_first_page(fetcher, url, cache):
+    """
+    Fetch page 1 of a search URL through the page cache.
+
+    A 304 from the HTTP backend, or a listing-ID set identical to last run's,
+    means nothing on this search changed, so parsing and pagination can be skipped.
+
+    Returns:
+        soup, or None when the page is unchanged since the last run
+    """
+    entry = cache.get(url)
+    soup = get_page_content(fetcher, url, max_retries=1, validators=entry)
+    validators = getattr(fetcher, "validators", None)
+
+    if soup is NOT_MODIFIED:
+        cache.update(url, entry["fingerprint"], validators, unchanged=True)
+        metrics.incr("searches_unchanged")
+        return None
+    if not soup:
+        raise RuntimeError(f"Failed to get content for URL: {url}")
+
+    if record_fingerprint(cache, url, entry, page_fingerprint(soup), validators):
+        return None
+    return soup
+
+def record_fingerprint(cache, url, entry, fingerprint, validators):
+    """
+    Store page 1's fingerprint and tell whether it matches last run's.
+
+    Returns:
+        bool: True if the page is unchanged and the search can be skipped
+    """
+    unchanged = entry is not None and entry.get("fingerprint") == fingerprint
+    cache.update(url, fingerprint, validators, unchanged=unchanged)
+    if unchanged:
+        print(f"[Crawler] First page unchanged since last run: {url}")
+        metrics.incr("searches_unchanged")
+    return unchanged
+
+def parse_page(soup, page, url=None):
+    """
+    Parse a fetched list page.
+
+    Returns:
+        tuple: (items, has_listings) where items maps listing ID to Listing and
+        has_listings is False once 591 shows its `.empty` page
+    """
+    items = {}
+    if GET_RECOMMENDS and page == 1:
+        recommends = get_recommends(soup, url)
+        if recommends:
+            items.update(recommends)
+
+    has_listings = False
+    if GET_NORMAL and soup.select_one('.empty') is None:
+        print(f'Getting page {page}')
+        normal_items = get_normal_items(soup, url)
+        if normal_items:
+            items.update(normal_items)
+            print(f'Successfully crawled page: {page}')
+        else:
+            print(f'No items found on page {page}')
+        has_listings = True
+
+    metrics.incr("listings_parsed", len(items))
+    return items, has_listings
+
+def crawl_page(fetcher, url, page, pushed=None, stats=None, cache=None):
+    """
+    Fetch and parse a single (url, page) task.
+
+    Returns:
+        tuple: (items, has_next) where has_next tells whether page + 1 should be crawled
+    """
+    with page_slots:
+        if page == 1 and cache:
+            soup = fetch_first_page(fetcher, url, cache)
+            if soup is None:
+                return {}, False
+        else:
+            soup = fetch_page(fetcher, url, page)
+        try:
+            items, has_listings = parse_page(soup, page, url)
+            reason = stop_reason(soup, pushed, url) if has_listings and page < MAX_PAGES else None
+        finally:
+            if LOW_MEMORY:
+                release_document(soup)
+
+    if not has_listings or page >= MAX_PAGES:
+        return items, False
+    if reason:
+        print(f"[Crawler] Stop paging after page {page}: {reason}")
+        if stats:
+            stats.record(page)
+        return items, False
+    return items, True
+
+def iter_crawler(sessions=None, urls=None, cache=None):
+    """
+    Crawl search URLs on the worker pool, yielding listings as pages come in.
+
+    A listing found on several pages is yielded once per page. Errors are
+    raised to the caller.
+
+    Args:
+        sessions (SessionManager): Reuse warm backends from this manager instead
+            of starting and quitting fresh ones for this run
+        urls (list): Search URLs to crawl, defaults to every generated URL
+        cache (PageCache): Page cache of the run, committed and saved by the caller
+            once the listings were delivered. Without one, a run with
+            INCREMENTAL_CRAWL on opens its own and commits it when the crawl ends
+
+    Yields:
+        Listing: Every listing of every crawled page
+    """
+    urls = generate_urls() if urls is None else urls
+    print(f"[Crawler] Start crawling {len(urls)} URLs with {CRAWLER_WORKERS} workers")
+    parse_cache.reset()
+
+    stats = PaginationStats()
+    pushed = load_pushed_ids() if STOP_WHEN_ALL_SEEN else None
+    own_cache = cache is None and INCREMENTAL_CRAWL
+    if own_cache:
+        cache = PageCache()
+
+    parser = None
+    handler = partial(crawl_page, pushed=pushed, stats=stats, cache=cache)
+    if PARSE_PROCESSES:
+        print(f"[Crawler] Parsing on {PARSE_PROCESSES} processes")
+        # Pages waiting for a parser count against the low-memory page limit too
+        queue_size = min(PARSE_QUEUE_SIZE, MAX_INFLIGHT_PAGES) if LOW_MEMORY else PARSE_QUEUE_SIZE
+        parser = ParsePool(queue_size=queue_size, initializer=init_parser_process, initargs=(pushed,))
+        handler = partial(crawl_page_pooled, parser=parser, stats=stats, cache=cache)
+
+    pool = CrawlPool(
+        sessions.acquire if sessions else get_fetcher,
+        handler,
+        workers=min(CRAWLER_WORKERS, len(urls)) or 1,
+        queue_size=TASK_QUEUE_SIZE,
+        max_retries=TASK_MAX_RETRIES,
+        release=sessions.release if sessions else None,
+        on_failure=(lambda url, page: cache.discard(url)) if cache else None,
+    )
     try:
-        driver = get_driver()
-        urls = generate_urls()
-        items = {}
-        
-        print(f"[Crawler] Start crawling {len(urls)} URLs")
+        for page_items in pool.iter_pages(urls):
+            yield from page_items.values()
+    finally:
+        if parser:
+            parser.close()
 
-        for url in urls:
-            try:
-                soup = get_page_content(driver, url)
-                if soup:
-                    if GET_RECOMMENDS:
-                        recommends = get_recommends(soup)
-                        if recommends:
-                            items.update(recommends)
-                    if GET_NORMAL:
-                        normal_items = get_normal(soup, url, driver)
-                        if normal_items:
-                            items.update(normal_items)
-                else:
-                    print(f"[Error] Failed to get content for URL: {url}")
-            except Exception as e:
-                error_msg = f"[Error] Failed to process URL {url}: {str(e)}"
-                print(error_msg)
-                traceback.print_exc()
-                continue  # Continue with next URL even if this one fails
-
-        driver.quit()
-        print("[Crawler] Done.")
+    stats.report()
+    parse_cache.report()
+    parse_cache.reset()
+    if own_cache:
+        cache.commit()
+        cache.save()
+    print("[Crawler] Done.")
+
+# Pushed IDs for stop_reason() inside a parser process, set by init_parser_process
+_parser_pushed = None
+
+def init_parser_process(pushed):
+    global _parser_pushed
+    _parser_pushed = pushed
+    # Each parser process keeps its own cache for the run; hits are counted in its metrics
+    parse_cache.reset()
+
+def parse_raw_page(html, page, url=None, fingerprint=False):
+    """
+    Parse a raw list page, runs in a ParsePool process.
+
+    Returns:
+        tuple: (records, has_listings, reason, fingerprint) where records is a
+        list of (id, Listing) tuples and reason is stop_reason()'s verdict
+    """
+    soup = parse_html(html)
+    try:
+        items, has_listings = parse_page(soup, page, url)
+        reason = stop_reason(soup, _parser_pushed, url) if has_listings else None
+        return list(items.items()), has_listings, reason, page_fingerprint(soup) if fingerprint else None
+    finally:
+        if LOW_MEMORY:
+            release_document(soup)
+
+def crawl_page_pooled(fetcher, url, page, parser, stats=None, cache=None):
+    """
+    Same as crawl_page, but the page is parsed on `parser` (a ParsePool).
+
+    The fetch thread hands the HTML over and returns without waiting for the
+    parse, so it can load its next page while this one is being parsed.
+
+    Returns:
+        Future | tuple: Resolves to (items, has_next) once the page is parsed, see
+        CrawlPool; a plain (items, has_next) if there was nothing to parse
+    """
+    entry = cache.get(url) if page == 1 and cache else None
+    target = page_url(url, page)
+    with page_slots:
+        html = get_page_content(fetcher, target, max_retries=1, validators=entry, raw=True)
+        validators = getattr(fetcher, "validators", None)
+
+        if html is NOT_MODIFIED:
+            cache.update(url, entry["fingerprint"], validators, unchanged=True)
+            metrics.incr("searches_unchanged")
+            return {}, False
+        if not html:
+            raise RuntimeError(f"Failed to get content for URL: {target}")
+
+        want_fingerprint = page == 1 and cache is not None
+        # Blocks while the parse queue is full, so the page still counts against page_slots until then
+        parsed = parser.submit(parse_raw_page, html, page, url, want_fingerprint)
+        del html
+
+    done = Future()
+
+    def finish(parsed):
+        try:
+            done.set_result(finish_pooled_page(parsed.result(), url, page, entry, validators, stats, cache))
+        except Exception as e:
+            done.set_exception(e)
+
+    parsed.add_done_callback(finish)
+    return done
+
+def finish_pooled_page(parsed, url, page, entry, validators, stats=None, cache=None):
+    """
+    Turn parse_raw_page()'s result into crawl_page's (items, has_next).
+
+    Runs on the ParsePool's callback thread once the page is parsed.
+    """
+    records, has_listings, reason, fingerprint = parsed
+    if page == 1 and cache is not None and record_fingerprint(cache, url, entry, fingerprint, validators):
+        return {}, False
+
+    items = dict(records)
+    # parse_page counted them in the parser process, whose metrics are not ours
+    metrics.incr("listings_parsed", len(items))
+    if not has_listings or page >= MAX_PAGES:
+        return items, False
+    if reason:
+        print(f"[Crawler] Stop paging after page {page}: {reason}")
+        if stats:
+            stats.record(page)
+        return items, False
+    return items, True
+
+def run_crawler(sessions=None, urls=None, cache=None):
+    """
+    Crawl search URLs on the worker pool.
+
+    Args:
+        sessions (SessionManager): Reuse warm backends from this manager instead
+            of starting and quitting fresh ones for this run
+        urls (list): Search URLs to crawl, defaults to every generated URL
+        cache (PageCache): Page cache of the run, see iter_crawler()
+
+    Returns:
+        dict: Listing ID -> Listing, or None on a critical failure
+    """
+    try:
+        items = {}
+        for listing in iter_crawler(sessions, urls, cache):
+            merge_listing(items, listing)
         return items
     except Exception as e:
         error_msg = f"[Critical Error] Crawler failed: {str(e)}"
@@ -103,7 +512,8 @@ def run_crawler():
         traceback.print_exc()
         return None
 
-def get_recommends(soup):
+@metrics.timed("select_recommends")
+def get_recommends(soup, source_url=None):
     if not soup:
         print("[Error] Empty soup object in get_recommends")
         return None
@@ -119,29 +529,32 @@ def get_recommends(soup):
             title_elem = item.select_one("a.title")
             price_elem = item.select_one("div.price-info")
             area_elem = item.select_one("span.area")
+            address_elem = item.select_one("span.address")
             
             if not all([title_elem, price_elem, area_elem]):
                 print("[Warning] Missing elements in listing")
                 continue
                 
             title = title_elem.text.strip()
-            price = price_elem.text.strip() + "元"
-            area = area_elem.text.strip()
-            link = title_elem['href'] if 'href' in title_elem.attrs else None
-            id = link.split("/")[-1] if link else None
+            price = parse_price(price_elem.text)
+            ping = parse_ping(area_elem.text)
+            link = title_elem.get('href')
+            id = listing_id(link)
 
-            if not link:
+            if not link or id is None:
                 print("[Warning] Missing link in listing")
                 continue
             
             print("ID:", id)
             print("Title:", title)
             print("Price:", price)
-            print("Area:", area)
+            print("Area:", ping)
             print("Link:", link)
             print("-" * 20)
 
-            data[id] = f"ID: {id}\n{title}\n租金：{price}\n坪數：{area}\n{link}\n"
+            address = address_elem.text.strip() if address_elem else None
+
+            data[id] = Listing(id, title, link, price=price, ping=ping, kind=kind_of(source_url), source_url=source_url, recommended=True, address=address)
         except Exception as e:
             print(f"[Error] Failed to parse listing: {str(e)}")
             traceback.print_exc()
@@ -158,53 +571,7 @@ def get_recommends(soup):
         print("[Info] No valid recommended listings found")
         return None
 
-def get_normal(soup, url, driver):
-    if not soup:
-        print("[Error] Empty soup object in get_normal")
-        return
-        
-    page = 1
-    data = {}
-    max_pages = 5  # Safety limit to prevent infinite loops
-    
-    try:
-        while soup.select_one('.empty') is None and page <= max_pages:
-            print(f'Getting page {page}')
-            items_data = get_normal_items(soup)
-            if items_data:
-                data.update(items_data)
-                print(f'Successfully crawled page: {page}')
-            else:
-                print(f'No items found on page {page}')
-                
-            page += 1
-            try:
-                next_url = url + f'&page={page}'
-                soup = get_page_content(driver, next_url)
-                if not soup:
-                    print(f"[Error] Failed to get content for URL: {next_url}")
-                    break
-                time.sleep(1)
-            except Exception as e:
-                print(f"[Error] Failed to fetch page {page}: {str(e)}")
-                traceback.print_exc()
-                break
-    except Exception as e:
-        print(f"[Error] Error in pagination: {str(e)}")
-        traceback.print_exc()
-    
-    if data:
-        try:
-            return data
-        except Exception as e:
-            print(f"[Error] Failed to send Line notification: {str(e)}")
-            traceback.print_exc()
-            return None
-    else:
-        print("[Info] No valid normal listings to send")
-        return None
-
-def get_normal_items(soup):
+def get_normal_items(soup, source_url=None):
     if not soup:
         print("[Error] Empty soup object in get_normal_items")
         return None
@@ -223,10 +590,20 @@ def get_normal_items(soup):
                 print("[Warning] Missing title element in listing")
                 continue
                 
-            title = title_element.text.strip() if title_element else None
-            link = title_element['href'] if title_element and 'href' in title_element.attrs else None
-            
-            if not title or not link:
+            link = title_element.get('href')
+            id = listing_id(link)
+            if id is None:
+                print("[Warning] Missing listing ID in link")
+                continue
+
+            # Another search already parsed this listing during this run
+            cached = parse_cache.get(id, source_url)
+            if cached is not None:
+                data[id] = cached
+                continue
+
+            title = title_element.text.strip()
+            if not title:
                 print("[Warning] Missing title or link in listing")
                 continue
 
@@ -238,17 +615,37 @@ def get_normal_items(soup):
                 print("[Warning] Missing time information in listing")
                 continue
                 
-            if not is_new_listing(time):
+            age = post_age_minutes(time)
+            if not is_within_window(age):
                 continue
-            
-            id = link.split("/")[-1] if link else None
+
+            # Price, area and floor are optional, the listing is still worth sending without them
+            price_element = item.select_one(".item-info-price")
+            price = parse_price(price_element.text) if price_element else None
+            ping = None
+            floor = top_floor = None
+            for span in item.select("div.item-info-txt span"):
+                text = span.text
+                if ping is None and "坪" in text:
+                    ping = parse_ping(text)
+                elif floor is None and "/" in text:
+                    # Basement floors read 'B1/5F', without an F before the slash
+                    floor, top_floor = parse_floor(text)
+            address = None
+            for txt in item.select("div.item-info-txt"):
+                if txt.select_one("i.house-place"):
+                    address_element = txt.select_one("span.line")
+                    address = address_element.text.strip() if address_element else None
+                    break
+
             print("ID:", id)
             print("Title:", title)
             print("Link:", link)
             print("Time:", time)
             print("-" * 20)
 
-            data[id] = f"ID: {id}\n{title}\n{link}\n"
+            data[id] = Listing(id, title, link, price=price, ping=ping, age_minutes=age, kind=kind_of(source_url), source_url=source_url, address=address, floor=floor, top_floor=top_floor)
+            parse_cache.put(data[id])
         except IndexError as e:
             print(f"[Error] Index error while parsing listing: {str(e)}")
             continue
@@ -0,0 +1,220 @@
+"""
+Coordinator / worker crawl mode.
+
+With CRAWL_ENGINE = "distributed", main.py / main_github_action.py act as
+the coordinator: they queue page 1 of every search URL, crawl alongside
+the other workers with DISTRIBUTED_LOCAL_WORKERS threads, and collect the
+results for the usual dedup against the pushed-ID store. Extra workers,
+on this machine or others sharing the queue, are started with
+
+    python -m app.distributed worker
+    python -m app.distributed status
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+
+from config import JOB_LEASE_SECONDS, JOB_POLL_SECONDS, DISTRIBUTED_LOCAL_WORKERS, DISTRIBUTED_TIMEOUT, STOP_WHEN_ALL_SEEN, SEEN_STORE_FILE
+from app.crawler import generate_urls, crawl_page, PaginationStats, parse_cache
+from app.libs.job_queue import get_job_queue
+from app.libs.listing import merge_listing
+from app.libs.env import load_env
+from app.libs.utils import get_fetcher, load_pushed_ids
+from app.libs.metrics import metrics
+
+
+def worker_name(suffix=""):
+    return f"{socket.gethostname()}-{os.getpid()}{suffix}"
+
+
+def local_pushed_ids():
+    """Pushed IDs for early termination, if this machine has the store"""
+    if STOP_WHEN_ALL_SEEN and os.path.exists(SEEN_STORE_FILE):
+        return load_pushed_ids()
+    return None
+
+
+def run_worker(queue=None, name=None, stop=None, idle_exit=False, pushed=None, stats=None, fetcher_factory=get_fetcher, release=None):
+    """
+    Claim and crawl (url, page) jobs until `stop` is set.
+
+    Workers run without the page cache, since several processes would
+    overwrite each other's cache file. The per-run parse cache is cleared
+    whenever a job from a different run is claimed.
+
+    Args:
+        queue: Job queue, a new connection is opened if None
+        name (str): Worker name the leases are taken under
+        stop (threading.Event): Set to make the worker exit after its current job
+        idle_exit (bool): Also exit once no run has work left
+        pushed (PushedIds): Pushed IDs for early termination
+        stats (PaginationStats): Tally of pages saved by early termination
+        fetcher_factory (callable): Returns a new fetch backend
+        release (callable): Called with the backend on exit, defaults to quitting it
+    """
+    queue = queue or get_job_queue()
+    name = name or worker_name()
+    fetcher = None
+    done = 0
+    run_id = None
+    print(f"[Worker] {name} started on the {queue.name} job queue")
+
+    try:
+        while not (stop and stop.is_set()):
+            job = queue.claim(name, JOB_LEASE_SECONDS)
+            if job is None:
+                if idle_exit and queue.is_idle():
+                    break
+                time.sleep(JOB_POLL_SECONDS)
+                continue
+
+            if job["run_id"] != run_id:
+                run_id = job["run_id"]
+                parse_cache.reset()
+
+            try:
+                if not fetcher:
+                    fetcher = fetcher_factory()
+                    if not fetcher:
+                        raise RuntimeError("could not start a fetch backend")
+                items, has_next = crawl_page(fetcher, job["url"], job["page"], pushed=pushed, stats=stats)
+            except Exception as e:
+                print(f"[Worker] {name} failed on {job['url']} page {job['page']} (Attempt {job['attempts']}): {str(e)}")
+                traceback.print_exc()
+                metrics.incr("task_retries")
+                queue.fail(job, name)
+                # Assume the backend is in a bad state and start a fresh one
+                if fetcher:
+                    try:
+                        fetcher.quit()
+                    except Exception:
+                        pass
+                fetcher = None
+                continue
+
+            if queue.complete(job, name, list((items or {}).values()), has_next):
+                done += 1
+            else:
+                print(f"[Worker] {name} lost the lease on {job['url']} page {job['page']}, result dropped")
+                metrics.incr("jobs_lease_lost")
+    finally:
+        if fetcher:
+            (release or (lambda f: f.quit()))(fetcher)
+        print(f"[Worker] {name} finished {done} jobs")
+
+
+def iter_distributed_crawler(sessions=None, urls=None, cache=None):
+    """
+    Queue a new run and yield its listings as workers store them.
+
+    Listings come back from every worker, so the same ID can appear more
+    than once. Dedup happens centrally afterwards, as for the other engines.
+
+    Args:
+        sessions (SessionManager): Backends for the local worker threads
+        urls (list): Search URLs to queue, defaults to every generated URL
+        cache (PageCache): Ignored, workers run without the page cache (see run_worker)
+
+    Yields:
+        Listing: Every listing of every crawled page
+    """
+    queue = get_job_queue()
+    purged = queue.purge()
+    if purged:
+        print(f"[Distributed] Dropped {purged} old runs")
+
+    urls = generate_urls() if urls is None else urls
+    run_id = queue.start_run(urls)
+    print(f"[Distributed] Run {run_id}: queued {len(urls)} URLs on the {queue.name} job queue")
+
+    stop = threading.Event()
+    stats = PaginationStats()
+    pushed = local_pushed_ids()
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            kwargs={
+                "name": worker_name(f"-local{i}"),
+                "stop": stop,
+                "pushed": pushed,
+                "stats": stats,
+                "fetcher_factory": sessions.acquire if sessions else get_fetcher,
+                "release": sessions.release if sessions else None,
+            },
+            daemon=True,
+        )
+        for i in range(DISTRIBUTED_LOCAL_WORKERS)
+    ]
+    for t in threads:
+        t.start()
+
+    deadline = time.monotonic() + DISTRIBUTED_TIMEOUT
+    cursor = 0
+    try:
+        while True:
+            # Check before reading so results stored in between are not missed
+            finished = queue.is_finished(run_id)
+            listings, cursor = queue.results(run_id, after=cursor)
+            yield from listings
+            if finished:
+                break
+            if time.monotonic() > deadline:
+                print(f"[Distributed] Run {run_id} timed out after {DISTRIBUTED_TIMEOUT} seconds")
+                break
+            time.sleep(JOB_POLL_SECONDS)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        # Left open, the run's jobs would be claimed ahead of every later run's until the purge
+        if not queue.is_finished(run_id):
+            print(f"[Distributed] Run {run_id}: cancelled {queue.cancel(run_id)} unfinished jobs")
+
+    print(f"[Distributed] Run {run_id} jobs: {queue.summary(run_id)}")
+    stats.report()
+    queue.close()
+    print("[Distributed] Done.")
+
+
+def run_distributed_crawler(sessions=None, urls=None, cache=None):
+    """
+    Alternative entry point to run_crawler using the job queue.
+
+    Returns:
+        dict: Same items dict as run_crawler, or None on a critical failure
+    """
+    try:
+        items = {}
+        for listing in iter_distributed_crawler(sessions, urls):
+            merge_listing(items, listing)
+        return items
+    except Exception as e:
+        print(f"[Critical Error] Distributed crawler failed: {str(e)}")
+        traceback.print_exc()
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed 591 crawler worker")
+    parser.add_argument("command", choices=["worker", "status"])
+    parser.add_argument("--idle-exit", action="store_true", help="Exit once the queue has no work left")
+    args = parser.parse_args(argv)
+    load_env()
+
+    if args.command == "status":
+        queue = get_job_queue()
+        print(f"[Distributed] {queue.name} job queue is {'idle' if queue.is_idle() else 'busy'}")
+        return 0
+
+    try:
+        run_worker(idle_exit=args.idle_exit, pushed=local_pushed_ids())
+    except KeyboardInterrupt:
+        print("[Worker] Stopping...")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
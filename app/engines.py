@@ -0,0 +1,32 @@
+"""
+Crawl engines by CRAWL_ENGINE name.
+
+Each engine module is only imported when it is selected, so a run never
+pays for the dependencies of the engines it does not use.
+"""
+from importlib import import_module
+
+# CRAWL_ENGINE -> (module, collect everything, stream listings)
+ENGINES = {
+    "pool": ("app.crawler", "run_crawler", "iter_crawler"),
+    "async": ("app.async_crawler", "run_async_crawler", "iter_async_crawler"),
+    "distributed": ("app.distributed", "run_distributed_crawler", "iter_distributed_crawler"),
+}
+
+
+def load_engine(name):
+    """
+    Import the engine called `name`.
+
+    Returns:
+        tuple: (run_engine, stream_engine) entry points, both called as
+        engine(sessions=None, urls=None, cache=None)
+
+    Raises:
+        ValueError: If `name` is not in ENGINES
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Invalid CRAWL_ENGINE: {name}")
+    module, run, stream = ENGINES[name]
+    module = import_module(module)
+    return getattr(module, run), getattr(module, stream)
@@ -0,0 +1,25 @@
+import os
+
+# .env next to config.py, where every entry point used to find it
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".env")
+
+_loaded = False
+
+
+def load_env(path=ENV_FILE):
+    """
+    Load .env into os.environ, once per process.
+
+    Entry points call this before anything reads a secret. Variables that
+    are already set (e.g. GitHub Actions secrets) win over the file, and
+    without a .env file python-dotenv is never imported.
+    """
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+
+    if not os.path.exists(path):
+        return
+    from dotenv import load_dotenv
+    load_dotenv(path)
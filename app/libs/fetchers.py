@@ -0,0 +1,250 @@
+import json
+import os
+
+from app.libs.metrics import metrics
+
+# Any of these means the list page has finished rendering
+READY_SELECTOR = ".item, .empty, div.recommend-ware"
+
+# Returned by fetch() when a conditional request comes back 304
+NOT_MODIFIED = object()
+
+# What each backend imports once it is used, so a dry run can load (and check) them up front
+BACKEND_MODULES = {
+    "selenium": ("selenium.webdriver", "selenium.webdriver.support.ui"),
+    "http": ("requests",),
+}
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+def block_urls(driver, patterns):
+    """
+    Block requests matching `patterns` (CDP wildcards, e.g. "*.css") in this browser.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+
+
+def read_network_usage(driver):
+    """
+    Drain the performance log collected since the last call.
+
+    Returns:
+        tuple: (bytes transferred, number of blocked requests), or None if
+        performance logging is not enabled on this driver
+    """
+    from selenium.common.exceptions import WebDriverException
+
+    try:
+        entries = driver.get_log("performance")
+    except (WebDriverException, ValueError):
+        return None
+
+    transferred = 0
+    blocked = 0
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.loadingFinished":
+            transferred += int(message["params"].get("encodedDataLength", 0))
+        elif message["method"] == "Network.loadingFailed" and message["params"].get("blockedReason"):
+            blocked += 1
+    return transferred, blocked
+
+
+class SeleniumBackend:
+    """Fetch pages through an existing Chrome WebDriver."""
+
+    name = "selenium"
+
+    def __init__(self, driver, ready_timeout=10, report_bytes=False):
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+
+        # What get_page_content() retries on, see HttpBackend
+        self.timeout_errors = (TimeoutException,)
+        self.request_errors = (WebDriverException,)
+        self.driver = driver
+        self.ready_timeout = ready_timeout
+        # Browsers give no access to response headers, so no conditional requests
+        self.validators = None
+        self.pages = 0
+        self.report_bytes = report_bytes
+
+    def fetch(self, url, validators=None):
+        """
+        Load a URL in the browser and return the rendered HTML.
+        `validators` is accepted for interface parity and ignored.
+
+        Raises:
+            TimeoutException, WebDriverException: Propagated from Selenium
+        """
+        # Imported here, the wait helpers pull in most of Selenium (~250ms) and the http backend never needs them
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        self.pages += 1
+        self.driver.get(url)
+
+        # Wait until the listing containers are in the DOM instead of sleeping a fixed time
+        try:
+            WebDriverWait(self.driver, self.ready_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, READY_SELECTOR))
+            )
+        except TimeoutException:
+            print(f"[Warning] No listing container found within {self.ready_timeout}s: {url}")
+
+        # Check if page loaded successfully
+        if "Error" in self.driver.title or "404" in self.driver.title:
+            print(f"[Warning] Page may have error: {self.driver.title}")
+
+        if self.report_bytes:
+            self._report_usage()
+
+        return self.driver.page_source
+
+    def _report_usage(self):
+        """
+        Count what the last page load actually transferred and how many requests were blocked.
+
+        Blocked requests never report a size, so there is no honest per-page
+        "saved" figure; compare bytes_transferred across runs with
+        BLOCK_RESOURCES on and off instead.
+        """
+        usage = read_network_usage(self.driver)
+        if usage is None:
+            return
+
+        transferred, blocked = usage
+        metrics.incr("bytes_transferred", transferred)
+        metrics.incr("requests_blocked", blocked)
+        print(f"[Driver] {transferred / 1024:.0f}KB transferred, {blocked} requests blocked")
+
+    def is_alive(self):
+        """Cheap round trip to chromedriver, False if the browser is gone"""
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def rss_mb(self):
+        """
+        Resident memory of chromedriver and every Chrome process under it.
+
+        Returns:
+            float: Megabytes, or None where /proc is not available
+        """
+        service = getattr(self.driver, "service", None)
+        process = getattr(service, "process", None)
+        if process is None or not os.path.isdir("/proc"):
+            return None
+        return _tree_rss_kb(process.pid) / 1024
+
+    def quit(self):
+        self.driver.quit()
+
+
+class HttpBackend:
+    """
+    Fetch pages with a plain requests.Session.
+
+    The session keeps connections alive and pooled between requests, and
+    asks for gzip so list pages travel compressed.
+    """
+
+    name = "http"
+
+    # requests.Timeout is a RequestException, reported with the other request errors
+    timeout_errors = ()
+
+    def __init__(self, pool_size=10, timeout=15):
+        # requests takes ~150ms to import, only pay for it when this backend is chosen
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.request_errors = (requests.exceptions.RequestException,)
+        self.timeout = timeout
+        self.validators = None
+        self.pages = 0
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(self, url, validators=None):
+        """
+        GET a URL and return the decoded HTML.
+
+        Args:
+            url (str): URL to fetch
+            validators (dict): Optional "etag" / "last_modified" from a previous
+                response, sent as If-None-Match / If-Modified-Since
+
+        Returns:
+            str: HTML, or NOT_MODIFIED if the server answered 304. The response
+            validators are left on self.validators.
+
+        Raises:
+            requests.exceptions.RequestException: On network errors or non-2xx responses
+        """
+        self.pages += 1
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        res = self.session.get(url, headers=headers, timeout=self.timeout)
+        self.validators = {
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified"),
+        }
+        if res.status_code == 304:
+            return NOT_MODIFIED
+        res.raise_for_status()
+
+        # 591 serves UTF-8 but does not always say so in the Content-Type header
+        if "charset" not in res.headers.get("Content-Type", "").lower():
+            res.encoding = "utf-8"
+        return res.text
+
+    def is_alive(self):
+        return True
+
+    def rss_mb(self):
+        # Lives in our own process, nothing separate to recycle
+        return None
+
+    def quit(self):
+        self.session.close()
+
+
+def _tree_rss_kb(pid):
+    """Sum VmRSS of a process and its descendants from /proc"""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+                    break
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", "r") as f:
+                for child in f.read().split():
+                    total += _tree_rss_kb(int(child))
+    except (OSError, ValueError):
+        pass
+    return total
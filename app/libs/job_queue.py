@@ -0,0 +1,368 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from importlib.util import find_spec
+
+from config import JOB_QUEUE_BACKEND, JOB_QUEUE_FILE, JOB_MAX_ATTEMPTS
+from app.libs.listing import Listing
+
+# redis is imported by RedisJobQueue itself, so the SQLite queue never loads it
+HAS_REDIS = find_spec("redis") is not None
+
+# Runs older than this are dropped when a new one starts
+RUN_RETENTION_SECONDS = 24 * 3600
+
+
+def new_run_id():
+    return time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+class SQLiteJobQueue:
+    """
+    (url, page) crawl jobs in a SQLite file shared by every worker process.
+
+    A worker claims a job by taking a lease on it. If the worker dies, the
+    lease runs out and the job goes back to the next claim(). Claims and
+    completions run in IMMEDIATE transactions, so two processes never hold
+    the same job, and a result only counts if its worker still holds the
+    lease. Results are kept per run until the coordinator has read them.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=JOB_QUEUE_FILE, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        # Autocommit mode, transactions are opened explicitly
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, url TEXT NOT NULL, page INTEGER NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, lease_until REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, UNIQUE (run_id, url, page))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "seq INTEGER PRIMARY KEY, run_id TEXT NOT NULL, listing TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_run ON results (run_id, seq)")
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, urls):
+        """
+        Queue page 1 of every URL under a new run.
+
+        Returns:
+            str: The run ID
+        """
+        run_id = new_run_id()
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (run_id, url, page, created_at) VALUES (?, ?, 1, ?)",
+            [(run_id, url, now) for url in urls],
+        )
+        self.conn.execute("COMMIT")
+        return run_id
+
+    def claim(self, worker, lease_seconds):
+        """
+        Lease the oldest pending job, or one whose lease ran out.
+
+        Returns:
+            dict: id, run_id, url, page and attempts of the job, or None if there is none
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = self.conn.execute(
+                    "SELECT id, run_id, url, page, attempts FROM jobs "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+
+                job_id, run_id, url, page, attempts = row
+                if attempts >= self.max_attempts:
+                    # Its last worker died holding the lease
+                    self.conn.execute("UPDATE jobs SET status = 'failed', lease_until = NULL WHERE id = ?", (job_id,))
+                    continue
+
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    (worker, now + lease_seconds, job_id),
+                )
+                return {"id": job_id, "run_id": run_id, "url": url, "page": page, "attempts": attempts + 1}
+        finally:
+            self.conn.execute("COMMIT")
+
+    def complete(self, job, worker, listings, has_next):
+        """
+        Store a job's listings and queue its next page.
+
+        Returns:
+            bool: False if the lease was lost to another worker, the result is dropped then
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        done = self.conn.execute(
+            "UPDATE jobs SET status = 'done', lease_until = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+            (job["id"], worker),
+        ).rowcount
+        if not done:
+            self.conn.execute("ROLLBACK")
+            return False
+
+        self.conn.executemany(
+            "INSERT INTO results (run_id, listing) VALUES (?, ?)",
+            [(job["run_id"], json.dumps(listing.to_dict(), ensure_ascii=False)) for listing in listings],
+        )
+        if has_next:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (run_id, url, page, created_at) VALUES (?, ?, ?, ?)",
+                (job["run_id"], job["url"], job["page"] + 1, time.time()),
+            )
+        self.conn.execute("COMMIT")
+        return True
+
+    def fail(self, job, worker):
+        """Give a job back after an error, or mark it failed once it ran out of attempts"""
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker = NULL, lease_until = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+            (self.max_attempts, job["id"], worker),
+        )
+
+    def cancel(self, run_id):
+        """
+        Close a run the coordinator gave up on, so no worker claims its jobs any more.
+
+        Returns:
+            int: Number of pending or leased jobs cancelled
+        """
+        return self.conn.execute(
+            "UPDATE jobs SET status = 'cancelled', lease_until = NULL WHERE run_id = ? AND status IN ('pending', 'leased')",
+            (run_id,),
+        ).rowcount
+
+    def is_finished(self, run_id):
+        """Whether every job of the run is done, failed or cancelled"""
+        return self.conn.execute(
+            "SELECT 1 FROM jobs WHERE run_id = ? AND status IN ('pending', 'leased') LIMIT 1", (run_id,)
+        ).fetchone() is None
+
+    def is_idle(self):
+        """Whether no run has work left at all"""
+        return self.conn.execute(
+            "SELECT 1 FROM jobs WHERE status IN ('pending', 'leased') LIMIT 1"
+        ).fetchone() is None
+
+    def results(self, run_id, after=0):
+        """
+        Returns:
+            tuple: (listings stored after cursor `after`, new cursor)
+        """
+        rows = self.conn.execute(
+            "SELECT seq, listing FROM results WHERE run_id = ? AND seq > ? ORDER BY seq", (run_id, after)
+        ).fetchall()
+        if not rows:
+            return [], after
+        return [Listing.from_dict(json.loads(listing)) for _, listing in rows], rows[-1][0]
+
+    def summary(self, run_id):
+        """Job counts of a run by status"""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (run_id,)))
+
+    def purge(self, max_age_seconds=RUN_RETENTION_SECONDS):
+        """Drop jobs and results of runs started more than `max_age_seconds` ago"""
+        cutoff = time.time() - max_age_seconds
+        self.conn.execute("BEGIN IMMEDIATE")
+        old_runs = [row[0] for row in self.conn.execute("SELECT DISTINCT run_id FROM jobs WHERE created_at < ?", (cutoff,))]
+        for run_id in old_runs:
+            self.conn.execute("DELETE FROM jobs WHERE run_id = ?", (run_id,))
+            self.conn.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+        self.conn.execute("COMMIT")
+        return len(old_runs)
+
+
+# Atomically requeue expired leases, then lease the next pending job
+_CLAIM_SCRIPT = """
+local prefix, now, deadline, worker = ARGV[1], tonumber(ARGV[2]), ARGV[3], ARGV[4]
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('RPUSH', KEYS[1], id)
+end
+local id = redis.call('LPOP', KEYS[1])
+if not id then
+    return nil
+end
+redis.call('ZADD', KEYS[2], deadline, id)
+redis.call('HSET', prefix .. ':job:' .. id, 'worker', worker, 'status', 'leased')
+redis.call('HINCRBY', prefix .. ':job:' .. id, 'attempts', 1)
+return id
+"""
+
+# Atomically finish a job if `worker` still holds its lease
+_COMPLETE_SCRIPT = """
+local prefix, id, worker, run_id = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+local job = prefix .. ':job:' .. id
+if redis.call('HGET', job, 'worker') ~= worker or redis.call('HGET', job, 'status') ~= 'leased' then
+    return 0
+end
+redis.call('HSET', job, 'status', 'done')
+redis.call('ZREM', KEYS[1], id)
+for i = 5, #ARGV do
+    redis.call('RPUSH', prefix .. ':run:' .. run_id .. ':results', ARGV[i])
+end
+redis.call('SREM', prefix .. ':run:' .. run_id .. ':open', id)
+return 1
+"""
+
+
+class RedisJobQueue:
+    """
+    Same job queue on Redis, for workers spread over several machines.
+
+    Pending job IDs live in a list and leases in a sorted set scored by
+    deadline. Claims and completions run as Lua scripts so they are atomic.
+    """
+
+    name = "redis"
+
+    def __init__(self, url=None, max_attempts=JOB_MAX_ATTEMPTS, prefix="crawler"):
+        import redis
+
+        self.client = redis.Redis.from_url(url or os.getenv("REDIS_URL"), decode_responses=True)
+        self.max_attempts = max(1, max_attempts)
+        self.prefix = prefix
+        self.pending_key = f"{prefix}:pending"
+        self.leases_key = f"{prefix}:leases"
+        self.claim_script = self.client.register_script(_CLAIM_SCRIPT)
+        self.complete_script = self.client.register_script(_COMPLETE_SCRIPT)
+
+    def close(self):
+        self.client.close()
+
+    def _run_key(self, run_id, name):
+        return f"{self.prefix}:run:{run_id}:{name}"
+
+    def _enqueue(self, run_id, url, page):
+        if not self.client.sadd(self._run_key(run_id, "keys"), f"{page}|{url}"):
+            return
+        job_id = self.client.incr(f"{self.prefix}:seq")
+        self.client.hset(f"{self.prefix}:job:{job_id}", mapping={
+            "run_id": run_id, "url": url, "page": page, "attempts": 0, "status": "pending",
+        })
+        self.client.sadd(self._run_key(run_id, "jobs"), job_id)
+        self.client.sadd(self._run_key(run_id, "open"), job_id)
+        self.client.rpush(self.pending_key, job_id)
+
+    def start_run(self, urls):
+        run_id = new_run_id()
+        self.client.zadd(f"{self.prefix}:runs", {run_id: time.time()})
+        for url in urls:
+            self._enqueue(run_id, url, 1)
+        return run_id
+
+    def claim(self, worker, lease_seconds):
+        while True:
+            now = time.time()
+            job_id = self.claim_script(
+                keys=[self.pending_key, self.leases_key],
+                args=[self.prefix, now, now + lease_seconds, worker],
+            )
+            if job_id is None:
+                return None
+
+            job = self.client.hgetall(f"{self.prefix}:job:{job_id}")
+            attempts = int(job["attempts"])
+            if attempts > self.max_attempts:
+                self._give_up(job_id, job["run_id"])
+                continue
+            return {"id": job_id, "run_id": job["run_id"], "url": job["url"], "page": int(job["page"]), "attempts": attempts}
+
+    def _give_up(self, job_id, run_id):
+        self.client.hset(f"{self.prefix}:job:{job_id}", "status", "failed")
+        self.client.zrem(self.leases_key, job_id)
+        self.client.srem(self._run_key(run_id, "open"), job_id)
+
+    def complete(self, job, worker, listings, has_next):
+        # Queue the next page first so the run never looks finished in between
+        if has_next:
+            self._enqueue(job["run_id"], job["url"], job["page"] + 1)
+        payloads = [json.dumps(listing.to_dict(), ensure_ascii=False) for listing in listings]
+        return bool(self.complete_script(
+            keys=[self.leases_key],
+            args=[self.prefix, job["id"], worker, job["run_id"]] + payloads,
+        ))
+
+    def fail(self, job, worker):
+        key = f"{self.prefix}:job:{job['id']}"
+        if self.client.hget(key, "worker") != worker or self.client.hget(key, "status") != "leased":
+            return
+        if int(self.client.hget(key, "attempts") or 0) >= self.max_attempts:
+            self._give_up(job["id"], job["run_id"])
+            return
+        self.client.hset(key, "status", "pending")
+        self.client.zrem(self.leases_key, job["id"])
+        self.client.rpush(self.pending_key, job["id"])
+
+    def cancel(self, run_id):
+        open_key = self._run_key(run_id, "open")
+        job_ids = self.client.smembers(open_key)
+        for job_id in job_ids:
+            # Out of the queues first; a claim that got in between loses its lease below
+            self.client.lrem(self.pending_key, 0, job_id)
+            self.client.zrem(self.leases_key, job_id)
+            self.client.hset(f"{self.prefix}:job:{job_id}", "status", "cancelled")
+        self.client.delete(open_key)
+        return len(job_ids)
+
+    def is_finished(self, run_id):
+        return self.client.scard(self._run_key(run_id, "open")) == 0
+
+    def is_idle(self):
+        return self.client.llen(self.pending_key) == 0 and self.client.zcard(self.leases_key) == 0
+
+    def results(self, run_id, after=0):
+        payloads = self.client.lrange(self._run_key(run_id, "results"), after, -1)
+        return [Listing.from_dict(json.loads(payload)) for payload in payloads], after + len(payloads)
+
+    def summary(self, run_id):
+        return {"open": self.client.scard(self._run_key(run_id, "open")), "results": self.client.llen(self._run_key(run_id, "results"))}
+
+    def purge(self, max_age_seconds=RUN_RETENTION_SECONDS):
+        runs_key = f"{self.prefix}:runs"
+        old_runs = self.client.zrangebyscore(runs_key, "-inf", time.time() - max_age_seconds)
+        for run_id in old_runs:
+            job_ids = self.client.smembers(self._run_key(run_id, "jobs"))
+            if job_ids:
+                self.client.delete(*(f"{self.prefix}:job:{job_id}" for job_id in job_ids))
+            self.client.delete(*(self._run_key(run_id, name) for name in ("jobs", "keys", "open", "results")))
+            self.client.zrem(runs_key, run_id)
+        return len(old_runs)
+
+
+def get_job_queue(backend=None):
+    """
+    Open the job queue named by JOB_QUEUE_BACKEND.
+
+    "redis" needs the redis package and REDIS_URL in .env, otherwise the
+    SQLite file stands in for it, which covers workers on one machine or a shared disk.
+    """
+    backend = backend or JOB_QUEUE_BACKEND
+    if backend == "redis":
+        if HAS_REDIS and os.getenv("REDIS_URL"):
+            return RedisJobQueue()
+        print("[JobQueue] Redis needs the redis package and REDIS_URL, falling back to SQLite")
+    elif backend != "sqlite":
+        raise ValueError(f"Invalid JOB_QUEUE_BACKEND: {backend}")
+    return SQLiteJobQueue()
@@ -0,0 +1,136 @@
+import re
+from urllib.parse import urlsplit, parse_qs
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_TRAILING_ID = re.compile(r"(\d+)/?$")
+_FLOOR = re.compile(r"^(B?)(\d+)F?/(\d+)F$", re.IGNORECASE)
+
+
+class Listing:
+    """
+    One rental listing parsed from a 591 list page.
+
+    Attributes:
+        id (int): 591 listing ID
+        title (str): Listing title
+        link (str): Listing detail URL
+        price (int): Monthly rent in NTD, None if not shown
+        ping (float): Floor area in 坪, None if not shown
+        age_minutes (int): Minutes since the listing was posted / updated, None if unknown
+        kind (str): 591 kind code of the search that found it (see KINDS_TABLE)
+        source_url (str): Search URL the listing was first found on
+        source_urls (list): Every search URL it was found on this run, source_url first
+        recommended (bool): Whether it came from the recommended block
+        address (str): District and street as shown on the list page, None if not shown
+        floor (int): Floor of the unit, negative for basements, None if not shown
+        top_floor (int): Number of floors of the building, None if not shown
+    """
+
+    __slots__ = ("id", "title", "link", "price", "ping", "age_minutes", "kind", "source_url", "recommended", "address", "floor", "top_floor", "source_urls")
+
+    def __init__(self, id, title, link, price=None, ping=None, age_minutes=None, kind=None, source_url=None, recommended=False, address=None, floor=None, top_floor=None,
+                 source_urls=None):
+        self.id = id
+        self.title = title
+        self.link = link
+        self.price = price
+        self.ping = ping
+        self.age_minutes = age_minutes
+        self.kind = kind
+        self.source_url = source_url
+        self.recommended = recommended
+        self.address = address
+        self.floor = floor
+        self.top_floor = top_floor
+        self.source_urls = list(source_urls) if source_urls else ([source_url] if source_url else [])
+
+    def __repr__(self):
+        return f"Listing(id={self.id}, price={self.price}, ping={self.ping}, age_minutes={self.age_minutes}, kind={self.kind})"
+
+    def to_dict(self):
+        """Plain dict of every field, e.g. for JSON"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def add_sources(self, urls):
+        """Record more search URLs this listing was found on"""
+        for url in urls:
+            if url and url not in self.source_urls:
+                self.source_urls.append(url)
+
+
+def merge_listing(items, listing):
+    """
+    Add a listing to an ID -> Listing dict.
+
+    Merged searches often return the same listing more than once. The first
+    Listing is kept and picks up the search URLs of later copies, so profile
+    routing sees every search that found it.
+
+    Returns:
+        bool: True if the ID was not in `items` yet
+    """
+    known = items.get(listing.id)
+    if known is None:
+        items[listing.id] = listing
+        return True
+    if known is not listing:
+        known.add_sources(listing.source_urls)
+    return False
+
+
+def listing_id(link):
+    """Extract the numeric listing ID from a detail link, or None"""
+    if not link:
+        return None
+    match = _TRAILING_ID.search(link.split("?")[0])
+    return int(match.group(1)) if match else None
+
+
+def parse_price(text):
+    """'18,000元/月' -> 18000, None if there is no number"""
+    match = _NUMBER.search(text or "")
+    return int(float(match.group(0).replace(",", ""))) if match else None
+
+
+def parse_ping(text):
+    """'12.5坪' -> 12.5, None if there is no number"""
+    match = _NUMBER.search(text or "")
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+def parse_floor(text):
+    """
+    '3F/7F' -> (3, 7), 'B1/5F' -> (-1, 5)
+
+    Returns:
+        tuple: (floor, top_floor), (None, None) if the text is not a floor
+    """
+    match = _FLOOR.match((text or "").strip())
+    if not match:
+        return None, None
+    floor = int(match.group(2))
+    return (-floor if match.group(1) else floor), int(match.group(3))
+
+
+def kind_of(url):
+    """Read the kind parameter of a search URL"""
+    if not url:
+        return None
+    return parse_qs(urlsplit(url).query).get("kind", [None])[0]
+
+
+def render_listing(listing):
+    """
+    Render a listing as the LINE message block for it.
+    """
+    lines = [f"ID: {listing.id}", listing.title]
+    if listing.price is not None:
+        lines.append(f"租金：{listing.price:,}元")
+    if listing.ping is not None:
+        lines.append(f"坪數：{listing.ping:g}坪")
+    lines.append(listing.link)
+    return "\n".join(lines) + "\n"
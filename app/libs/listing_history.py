@@ -0,0 +1,299 @@
+"""
+Every listing ever crawled, with its price history.
+
+    python -m app.libs.listing_history drops            # price dropped since first seen
+    python -m app.libs.listing_history dupes 16123456   # likely relists of a listing
+"""
+import argparse
+import hashlib
+import re
+import sqlite3
+import time
+import traceback
+
+from config import LISTING_HISTORY_FILE, HISTORY_BATCH_SIZE
+
+_SPACES = re.compile(r"\s+")
+
+_COLUMNS = "id, fingerprint, place_key, title, address, ping, kind, link, first_price, last_price, min_price, first_seen, last_seen, seen_count"
+
+
+def _normalize(text):
+    return _SPACES.sub(" ", text or "").strip().lower()
+
+
+def content_fingerprint(listing):
+    """
+    Hash of what a listing shows: title, area, price and address.
+
+    A relist under a new ID usually keeps all four, while the ID changes.
+
+    Returns:
+        int: First 64 bits of the SHA-1, small enough to index cheaply
+    """
+    parts = [
+        _normalize(listing.title),
+        f"{listing.ping:g}" if listing.ping is not None else "",
+        str(listing.price) if listing.price is not None else "",
+        _normalize(listing.address),
+    ]
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def place_key(listing):
+    """
+    Address + area + kind, which survives a relist at a new price or title.
+
+    Returns:
+        str: The key, or None if the list page showed no address or area
+    """
+    if not listing.address or listing.ping is None:
+        return None
+    return f"{_normalize(listing.address)}|{listing.ping:g}|{listing.kind or ''}"
+
+
+class ListingHistory:
+    """
+    SQLite store of every listing seen, keyed by its 591 ID.
+
+    upsert_many() writes a whole batch in one transaction. first_price is
+    kept from the first sighting, and a trigger logs every change of
+    last_price into price_changes. Lookups by content fingerprint and by
+    place key are indexed, and price drops have a partial index, so
+    queries stay fast at hundreds of thousands of rows.
+    """
+
+    def __init__(self, path=LISTING_HISTORY_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS listings (
+                id INTEGER PRIMARY KEY,
+                fingerprint INTEGER NOT NULL,
+                place_key TEXT,
+                title TEXT,
+                address TEXT,
+                ping REAL,
+                kind TEXT,
+                link TEXT,
+                first_price INTEGER,
+                last_price INTEGER,
+                min_price INTEGER,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                seen_count INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS listings_fingerprint ON listings (fingerprint);
+            CREATE INDEX IF NOT EXISTS listings_place ON listings (place_key) WHERE place_key IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS listings_dropped ON listings (last_seen) WHERE last_price < first_price;
+
+            CREATE TABLE IF NOT EXISTS price_changes (
+                id INTEGER NOT NULL,
+                old_price INTEGER,
+                new_price INTEGER,
+                changed_at INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS price_changes_id ON price_changes (id, changed_at);
+
+            CREATE TRIGGER IF NOT EXISTS listings_price_change
+            AFTER UPDATE OF last_price ON listings
+            WHEN old.last_price IS NOT new.last_price
+            BEGIN
+                INSERT INTO price_changes (id, old_price, new_price, changed_at)
+                VALUES (new.id, old.last_price, new.last_price, new.last_seen);
+            END;
+        """)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert_many(self, listings, seen_at=None):
+        """
+        Record a batch of sightings in one transaction.
+
+        seen_count only goes up for a sighting later than last_seen, so a
+        listing found on several pages of one run is counted once as long as
+        the whole run passes the same `seen_at`.
+
+        Args:
+            listings (iterable): Listings to record
+            seen_at (int): Timestamp of the run, defaults to now
+
+        Returns:
+            int: Number of listings written
+        """
+        now = seen_at or int(time.time())
+        rows = [
+            (
+                listing.id, content_fingerprint(listing), place_key(listing), listing.title, listing.address,
+                listing.ping, listing.kind, listing.link, listing.price, listing.price, listing.price, now, now,
+            )
+            for listing in listings
+        ]
+        if not rows:
+            return 0
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO listings (id, fingerprint, place_key, title, address, ping, kind, link, "
+                "first_price, last_price, min_price, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET "
+                "fingerprint = excluded.fingerprint, "
+                "place_key = COALESCE(excluded.place_key, place_key), "
+                "title = excluded.title, "
+                "address = COALESCE(excluded.address, address), "
+                "ping = COALESCE(excluded.ping, ping), "
+                "link = excluded.link, "
+                "first_price = COALESCE(first_price, excluded.last_price), "
+                "last_price = COALESCE(excluded.last_price, last_price), "
+                "min_price = MIN(COALESCE(min_price, excluded.last_price), COALESCE(excluded.last_price, min_price)), "
+                "last_seen = excluded.last_seen, "
+                "seen_count = seen_count + (excluded.last_seen > last_seen)",
+                rows,
+            )
+        return len(rows)
+
+    def get(self, listing_id):
+        """
+        Returns:
+            dict: The stored row, or None
+        """
+        cursor = self.conn.execute(f"SELECT {_COLUMNS} FROM listings WHERE id = ?", (listing_id,))
+        row = cursor.fetchone()
+        return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def price_drops(self, since_days=30, limit=50):
+        """
+        Listings seen within `since_days` whose price is below their first seen price.
+
+        Returns:
+            list: Rows as dicts with a `dropped` amount, biggest drop first
+        """
+        since = int(time.time()) - int(since_days * 86400)
+        cursor = self.conn.execute(
+            f"SELECT {_COLUMNS}, first_price - last_price AS dropped FROM listings "
+            "WHERE last_price < first_price AND last_seen >= ? ORDER BY dropped DESC LIMIT ?",
+            (since, limit),
+        )
+        names = [c[0] for c in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def price_history(self, listing_id):
+        """
+        Returns:
+            list: (old_price, new_price, changed_at) tuples, oldest first
+        """
+        return self.conn.execute(
+            "SELECT old_price, new_price, changed_at FROM price_changes WHERE id = ? ORDER BY changed_at", (listing_id,)
+        ).fetchall()
+
+    def likely_duplicates(self, listing_id, limit=20):
+        """
+        Other IDs that look like the same flat.
+
+        An identical content fingerprint is a near-certain relist. The same
+        address, area and kind under a different price or title is a likely one.
+
+        Returns:
+            list: (id, reason) tuples, exact matches first
+        """
+        row = self.conn.execute("SELECT fingerprint, place_key FROM listings WHERE id = ?", (listing_id,)).fetchone()
+        if not row:
+            return []
+        fingerprint, key = row
+
+        matches = [
+            (other, "same content")
+            for (other,) in self.conn.execute(
+                "SELECT id FROM listings WHERE fingerprint = ? AND id != ? ORDER BY last_seen DESC LIMIT ?",
+                (fingerprint, listing_id, limit),
+            )
+        ]
+        if key and len(matches) < limit:
+            exact = {other for other, _ in matches}
+            for (other,) in self.conn.execute(
+                "SELECT id FROM listings WHERE place_key = ? AND id != ? ORDER BY last_seen DESC LIMIT ?",
+                (key, listing_id, limit),
+            ):
+                if other not in exact and len(matches) < limit:
+                    matches.append((other, "same address and area"))
+        return matches
+
+
+def _upsert(history, batch, seen_at):
+    """Failing to record history must not stop the notifications"""
+    try:
+        history.upsert_many(batch, seen_at)
+    except Exception as e:
+        print(f"[History] Failed to record {len(batch)} listings: {str(e)}")
+        traceback.print_exc()
+
+
+def record_history(listings, batch_size=HISTORY_BATCH_SIZE):
+    """
+    Pass listings through unchanged while upserting them in batches.
+
+    Meant to wrap a listing stream, e.g. record_history(iter_crawler()).
+    Every batch is stamped with the run's start time, so a listing the
+    stream yields more than once still counts as one sighting.
+    """
+    seen_at = int(time.time())
+    with ListingHistory() as history:
+        batch = []
+        try:
+            for listing in listings:
+                batch.append(listing)
+                if len(batch) >= batch_size:
+                    _upsert(history, batch, seen_at)
+                    batch = []
+                yield listing
+        finally:
+            if batch:
+                _upsert(history, batch, seen_at)
+
+
+def save_history(items, batch_size=HISTORY_BATCH_SIZE):
+    """
+    Record a finished crawl's items dict.
+
+    Args:
+        items (dict): ID -> Listing, as returned by run_crawler
+    """
+    for _ in record_history((items or {}).values(), batch_size):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the listing history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    drops = sub.add_parser("drops", help="Listings whose price dropped since first seen")
+    drops.add_argument("--days", type=float, default=30)
+    drops.add_argument("--limit", type=int, default=50)
+    dupes = sub.add_parser("dupes", help="Likely duplicates of a listing")
+    dupes.add_argument("id", type=int)
+    args = parser.parse_args(argv)
+
+    with ListingHistory() as history:
+        if args.command == "drops":
+            for row in history.price_drops(args.days, args.limit):
+                print(f"{row['id']}  {row['first_price']:,} -> {row['last_price']:,} (-{row['dropped']:,})  {row['title']}  {row['link']}")
+        else:
+            for other, reason in history.likely_duplicates(args.id):
+                row = history.get(other)
+                print(f"{other}  {reason}  {row['title']}  {row['link']}")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import ctypes
+import ctypes.util
+import gc
+import os
+import threading
+
+from config import MEMORY_SAMPLE_SECONDS
+from app.libs.metrics import metrics
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"))
+    _malloc_trim = _libc.malloc_trim
+except (OSError, AttributeError, TypeError):
+    # Not glibc (macOS, musl, Windows): freed memory simply stays with the allocator
+    _malloc_trim = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb():
+    """
+    Resident memory of this process, not counting Chrome.
+
+    Returns:
+        float: Megabytes, or None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_memory():
+    """
+    Hand memory freed by a run back to the OS.
+
+    Parse trees are full of parent/child reference cycles that only the
+    cyclic collector frees, and glibc keeps freed arenas mapped unless
+    asked to trim them, which is what makes RSS creep between runs.
+    """
+    gc.collect()
+    if _malloc_trim:
+        _malloc_trim(0)
+
+
+class PeakMemory:
+    """
+    Samples this process's RSS on a background thread while a run is going.
+
+    On exit the peak and the RSS left after the run go into the metrics
+    report as the peak_rss_mb and rss_after_run_mb gauges. With `release`,
+    release_memory() runs first, so the second one shows what the process
+    keeps between runs.
+    """
+
+    def __init__(self, interval=MEMORY_SAMPLE_SECONDS, release=False):
+        self.interval = interval
+        self.release = release
+        self.peak = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._sample()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self._sample()
+        if self.release:
+            release_memory()
+        if self.peak is None:
+            return
+
+        after = rss_mb()
+        metrics.gauge("peak_rss_mb", round(self.peak, 1))
+        metrics.gauge("rss_after_run_mb", round(after, 1))
+        print(f"[Memory] Peak RSS {self.peak:.1f} MB this run, {after:.1f} MB after")
+
+    def _sample(self):
+        rss = rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._sample()
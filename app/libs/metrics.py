@@ -0,0 +1,157 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import RUN_REPORT_FILE, PROMETHEUS_TEXTFILE
+
+
+class Metrics:
+    """
+    Process-wide counters and stage timers for one crawl run.
+
+    Everything is guarded by one lock so pool workers and executor threads
+    can record into the same instance. reset() starts a new run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.counters = {}
+            self.gauges = {}
+            self.timings = {}
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Record a point-in-time value, replacing the previous one"""
+        with self.lock:
+            self.gauges[name] = value
+
+    def count(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of timer()"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            timings = {name: list(values) for name, values in self.timings.items()}
+
+        finished_at = time.time()
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "finished_at": datetime.fromtimestamp(finished_at).isoformat(timespec="seconds"),
+            "duration_seconds": round(finished_at - self.started_at, 3),
+            "counters": counters,
+            "gauges": gauges,
+            "timings": {name: _summarize(values) for name, values in sorted(timings.items())},
+        }
+
+    def write_report(self, path=RUN_REPORT_FILE, prometheus_path=PROMETHEUS_TEXTFILE):
+        """
+        Write the JSON run report and, if configured, a Prometheus textfile.
+
+        Returns:
+            dict: The report that was written
+        """
+        report = self.snapshot()
+        try:
+            if path:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                print(f"[Metrics] Run report written to {path}")
+            if prometheus_path:
+                _write_prometheus(report, prometheus_path)
+                print(f"[Metrics] Prometheus metrics written to {prometheus_path}")
+        except OSError as e:
+            print(f"[Metrics] Failed to write run report: {str(e)}")
+        return report
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[index]
+
+
+def _summarize(values):
+    values = sorted(values)
+    total = sum(values)
+    return {
+        "count": len(values),
+        "total": round(total, 4),
+        "mean": round(total / len(values), 4) if values else 0.0,
+        "p50": round(_percentile(values, 0.5), 4),
+        "p95": round(_percentile(values, 0.95), 4),
+        "p99": round(_percentile(values, 0.99), 4),
+        "max": round(values[-1], 4) if values else 0.0,
+    }
+
+
+def _metric_name(name):
+    return "crawler_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _write_prometheus(report, path):
+    lines = [
+        "# TYPE crawler_run_duration_seconds gauge",
+        f"crawler_run_duration_seconds {report['duration_seconds']}",
+    ]
+    for name, value in sorted(report["counters"].items()):
+        metric = _metric_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, value in sorted(report["gauges"].items()):
+        metric = _metric_name(name)
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    for name, summary in report["timings"].items():
+        metric = _metric_name(name) + "_seconds"
+        lines += [
+            f"# TYPE {metric} summary",
+            f'{metric}{{quantile="0.5"}} {summary["p50"]}',
+            f'{metric}{{quantile="0.95"}} {summary["p95"]}',
+            f'{metric}{{quantile="0.99"}} {summary["p99"]}',
+            f"{metric}_sum {summary['total']}",
+            f"{metric}_count {summary['count']}",
+        ]
+
+    # Write then rename so node_exporter never reads a half-written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+metrics = Metrics()
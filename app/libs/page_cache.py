@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config import PAGE_CACHE_FILE, PAGE_CACHE_MAX_ENTRIES
+
+
+class PageCache:
+    """
+    Persistent, size-bounded LRU cache of first-page state per search URL.
+
+    Each entry keeps a fingerprint of the page's listing-ID set and, when the
+    HTTP backend fetched it, the ETag / Last-Modified validators needed for a
+    conditional request next run.
+
+    An unchanged first page means the whole search can be skipped, which is
+    only safe once every listing it led to was delivered. A new fingerprint
+    is therefore only staged by update(), and commit() promotes it after the
+    run's pushes went through. Searches with a failed page or an undelivered
+    listing keep no entry at all, so the next run crawls them in full.
+    """
+
+    def __init__(self, path=PAGE_CACHE_FILE, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.entries = OrderedDict()
+        # Changed fingerprints of this run, waiting for commit()
+        self.staged = {}
+        # Searches with a page that could not be crawled this run
+        self.incomplete = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                # Stored oldest first, so the order is the LRU order
+                self.entries = OrderedDict(json.load(f).get("pages", []))
+        except (OSError, ValueError) as e:
+            print(f"[PageCache] Ignoring unreadable cache {self.path}: {str(e)}")
+            self.entries = OrderedDict()
+
+    def save(self):
+        with self.lock:
+            pages = list(self.entries.items())
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"pages": pages}, f, ensure_ascii=False)
+        print(f"[PageCache] Saved {len(pages)} pages, {self.hits} unchanged this run")
+
+    def get(self, url):
+        """Return a copy of the cached entry for `url`, or None"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            self.entries.move_to_end(url)
+            return dict(entry)
+
+    def update(self, url, fingerprint, validators=None, unchanged=False):
+        """
+        Record page 1 of `url`. An unchanged page refreshes its entry right
+        away, a changed one is staged until commit().
+        """
+        with self.lock:
+            entry = {"fingerprint": fingerprint, "checked_at": int(time.time())}
+            if validators:
+                entry.update({k: v for k, v in validators.items() if v})
+            if not unchanged:
+                self.staged[url] = entry
+                return
+            self._store(url, entry)
+            self.hits += 1
+
+    def discard(self, url):
+        """Mark a search whose crawl did not finish, it is not committed this run"""
+        with self.lock:
+            self.incomplete.add(url)
+
+    def commit(self, exclude=()):
+        """
+        Promote the staged fingerprints once their listings were delivered.
+
+        Args:
+            exclude (iterable): Searches that still have undelivered listings.
+                They and the searches passed to discard() lose their entry.
+
+        Returns:
+            int: Number of fingerprints committed
+        """
+        with self.lock:
+            dropped = self.incomplete | set(exclude)
+            committed = 0
+            for url, entry in self.staged.items():
+                if url not in dropped:
+                    self._store(url, entry)
+                    committed += 1
+            for url in dropped:
+                self.entries.pop(url, None)
+            self.staged.clear()
+            self.incomplete.clear()
+        return committed
+
+    def _store(self, url, entry):
+        self.entries[url] = entry
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
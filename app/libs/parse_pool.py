@@ -0,0 +1,55 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PARSE_PROCESSES, PARSE_QUEUE_SIZE
+
+
+class ParsePool:
+    """
+    Process pool for the CPU-bound parsing of raw list pages.
+
+    Fetch threads hand over HTML strings and get parsed results back, so
+    parsing neither holds the GIL of the fetching process nor waits for the
+    next page load. submit() blocks while `queue_size` pages are queued or
+    being parsed, so fetchers cannot pile up raw HTML faster than it is parsed.
+
+    Processes are spawned rather than forked, since the fetch threads
+    (and Chrome's driver connections) are already running when the first
+    page is submitted.
+    """
+
+    def __init__(self, processes=PARSE_PROCESSES, queue_size=PARSE_QUEUE_SIZE, initializer=None, initargs=()):
+        self.processes = max(1, processes)
+        self.slots = threading.BoundedSemaphore(max(1, queue_size))
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(*args) on a parser process, blocking while the queue is full.
+
+        Returns:
+            concurrent.futures.Future: The parse result
+        """
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,149 @@
+"""
+Parser engines for 591 list pages.
+
+Every engine returns a document exposing the same small selector API, which
+is all get_recommends / get_normal_items rely on:
+
+    node.select(css)       -> list of nodes
+    node.select_one(css)   -> node or None
+    node.text              -> text content
+    node.get(attr)         -> attribute value or None
+
+BeautifulSoup tags already provide it, so the bs4 engines ("html.parser" and
+"lxml") return the soup itself. selectolax nodes are wrapped in SelectolaxNode.
+
+Every engine is imported on its first parse, so a run only loads the one
+it parses with: the selectolax engine never loads bs4, and the bs4 engines
+never load selectolax.
+"""
+from importlib.util import find_spec
+
+from config import PARSER_ENGINE, RESTRICTED_PARSE
+
+HAS_LXML = find_spec("lxml") is not None
+HAS_SELECTOLAX = find_spec("selectolax") is not None
+
+# Only these containers are ever read, so a restricted parse keeps just them
+LISTING_CLASSES = ["item", "recommend-ware", "empty"]
+
+_resolved = {}
+_strainer = None
+_selectolax_parser = None
+
+
+def listing_strainer():
+    """SoupStrainer keeping only LISTING_CLASSES, built on first use"""
+    global _strainer
+    if _strainer is None:
+        from bs4 import SoupStrainer
+        _strainer = SoupStrainer(class_=LISTING_CLASSES)
+    return _strainer
+
+
+def selectolax_parser():
+    """selectolax's HTML parser class, imported on first use"""
+    global _selectolax_parser
+    if _selectolax_parser is None:
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:
+            # selectolax < 0.3 only ships the modest backend
+            from selectolax.parser import HTMLParser
+        _selectolax_parser = HTMLParser
+    return _selectolax_parser
+
+
+class SelectolaxNode:
+    """Adapter giving a selectolax node the BeautifulSoup-style selector API"""
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+    def select(self, css):
+        return [SelectolaxNode(n) for n in self.node.css(css)]
+
+    def select_one(self, css):
+        n = self.node.css_first(css)
+        return SelectolaxNode(n) if n is not None else None
+
+    @property
+    def text(self):
+        return self.node.text(deep=True)
+
+    @property
+    def attrs(self):
+        return self.node.attributes
+
+    def get(self, attr, default=None):
+        value = self.node.attributes.get(attr)
+        return default if value is None else value
+
+    def __getitem__(self, attr):
+        value = self.node.attributes.get(attr)
+        if value is None:
+            raise KeyError(attr)
+        return value
+
+
+def resolve_engine(engine):
+    """Fall back to html.parser when the requested engine is not installed"""
+    if engine in _resolved:
+        return _resolved[engine]
+
+    resolved = engine
+    if engine == "lxml" and not HAS_LXML:
+        print("[Parser] lxml is not installed (uv sync --extra fast), falling back to html.parser")
+        resolved = "html.parser"
+    elif engine == "selectolax" and not HAS_SELECTOLAX:
+        print("[Parser] selectolax is not installed (uv sync --extra fast), falling back to html.parser")
+        resolved = "html.parser"
+    elif engine not in ("html.parser", "lxml", "selectolax"):
+        print(f"[Parser] Unknown PARSER_ENGINE {engine}, falling back to html.parser")
+        resolved = "html.parser"
+
+    _resolved[engine] = resolved
+    return resolved
+
+
+def release_document(doc):
+    """
+    Tear down a parsed page as soon as its records are extracted.
+
+    A BeautifulSoup tree is a web of parent/child/sibling cycles that
+    otherwise waits for the cyclic garbage collector. decompose() breaks
+    them so the tree is freed right away. selectolax trees live in C memory
+    and are freed once the wrapper is dropped, so there is nothing to do.
+    """
+    # Only a bs4 document has decompose(); SelectolaxNode and raw HTML do not
+    if hasattr(doc, "decompose"):
+        doc.decompose()
+
+
+def parse_html(html_content, engine=None, restricted=None):
+    """
+    Parse a list page with the configured engine.
+
+    Args:
+        html_content (str): Raw HTML
+        engine (str): "html.parser", "lxml" or "selectolax", defaults to PARSER_ENGINE
+        restricted (bool): Only build the listing containers, defaults to RESTRICTED_PARSE
+
+    Returns:
+        BeautifulSoup | SelectolaxNode: Document supporting the selector API
+    """
+    engine = resolve_engine(engine or PARSER_ENGINE)
+    restricted = RESTRICTED_PARSE if restricted is None else restricted
+
+    if engine == "selectolax":
+        tree = selectolax_parser()(html_content)
+        if restricted:
+            # selectolax has no strainer; dropping script/style keeps the tree small
+            tree.strip_tags(["script", "style", "noscript", "svg"])
+        return SelectolaxNode(tree.root if tree.root is not None else tree)
+
+    from bs4 import BeautifulSoup
+
+    parse_only = listing_strainer() if restricted else None
+    return BeautifulSoup(html_content, engine, parse_only=parse_only)
@@ -0,0 +1,217 @@
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from config import (
+    POLL_SCHEDULE_FILE, DAILY_REQUEST_BUDGET, MIN_POLL_MINUTES, MAX_POLL_HOURS,
+    ARRIVAL_PRIOR_PER_HOUR, ARRIVAL_SMOOTHING, MAX_PAGES,
+)
+from app.libs.metrics import metrics
+from app.libs.profiles import load_profiles, search_window_hours
+
+TIMEZONE = ZoneInfo("Asia/Taipei")
+
+# Polls per search and day of the old fixed cron, the default budget matches it
+BASELINE_POLLS_PER_DAY = 8
+
+# Normal listings 591 shows per list page
+LISTINGS_PER_PAGE = 30
+
+# Keeps a search that never got a listing from dropping out of the allocation
+MIN_RATE = 0.01
+
+
+class PollSchedule:
+    """
+    Decides which search URLs are worth polling right now.
+
+    For every search it learns how many new listings arrive per hour of the
+    day, from the post ages of the listings each poll returns, and how many
+    page loads a poll costs. With arrival rate r and cost c, polling at a
+    frequency proportional to sqrt(r / c) minimises the expected time a new
+    listing waits to be seen for a given number of page loads. The factor is
+    chosen so a day's polls add up to the daily budget, and a hard cap on the
+    page loads actually spent per day backs that up.
+    """
+
+    def __init__(self, path=POLL_SCHEDULE_FILE, daily_budget=DAILY_REQUEST_BUDGET,
+                 min_interval=MIN_POLL_MINUTES * 60, max_interval=MAX_POLL_HOURS * 3600, profiles=None):
+        self.path = path
+        self.profiles = load_profiles() if profiles is None else profiles
+        self.daily_budget = daily_budget
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.searches = {}
+        self.day = None
+        self.spent = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.searches = data.get("searches", {})
+            self.day = data.get("day")
+            self.spent = data.get("spent", 0)
+        except (OSError, ValueError) as e:
+            print(f"[Scheduler] Ignoring unreadable schedule {self.path}: {str(e)}")
+            self.searches = {}
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"day": self.day, "spent": self.spent, "searches": self.searches}, f)
+
+    def _search(self, url):
+        return self.searches.setdefault(url, {"rates": [None] * 24, "pages": 1.0, "last_polled": None})
+
+    def rate(self, url, hour):
+        """Learned new listings per hour for `url` at `hour`, with a prior for unseen hours"""
+        rates = self.searches.get(url, {}).get("rates") or [None] * 24
+        rate = rates[hour]
+        if rate is None:
+            known = [r for r in rates if r is not None]
+            rate = sum(known) / len(known) if known else ARRIVAL_PRIOR_PER_HOUR
+        return max(MIN_RATE, rate)
+
+    def window_hours(self, url):
+        """The widest NEW_WITHIN_HOURS of the profiles `url` searches for"""
+        hours = [profile.new_within_hours for profile in self.profiles if profile.serves(url)]
+        return max(hours) if hours else search_window_hours(self.profiles)
+
+    def pages(self, url):
+        return max(1.0, self.searches.get(url, {}).get("pages", 1.0))
+
+    def budget(self, urls):
+        """Page loads allowed per day, by default what the fixed cron spent"""
+        if self.daily_budget:
+            return self.daily_budget
+        return BASELINE_POLLS_PER_DAY * sum(self.pages(url) for url in urls)
+
+    def interval(self, url, urls, now=None):
+        """
+        Seconds between polls of `url` at the current hour of the day.
+
+        Args:
+            url (str): Search URL to schedule
+            urls (list): Every search sharing the budget
+            now (float): Timestamp, defaults to now
+        """
+        hour = datetime.fromtimestamp(now or time.time(), TIMEZONE).hour
+        weight = sum(math.sqrt(self.rate(u, h) * self.pages(u)) for u in urls for h in range(24))
+        polls_per_hour = self.budget(urls) / weight * math.sqrt(self.rate(url, hour) / self.pages(url))
+        return min(self.max_interval, max(self.min_interval, 3600 / polls_per_hour))
+
+    def due(self, urls, now=None):
+        """
+        Searches to poll now, most overdue first, within what is left of today's budget.
+
+        Returns:
+            list: Search URLs to crawl this tick
+        """
+        now = now or time.time()
+        self._roll_day(now)
+        self.searches = {url: self.searches[url] for url in urls if url in self.searches}
+
+        overdue = []
+        for url in urls:
+            last = self.searches.get(url, {}).get("last_polled")
+            if last is None:
+                overdue.append((math.inf, url))
+                continue
+            ratio = (now - last) / self.interval(url, urls, now)
+            if ratio >= 1:
+                overdue.append((ratio, url))
+        overdue.sort(key=lambda pair: pair[0], reverse=True)
+
+        remaining = self.budget(urls) - self.spent
+        selected = []
+        for _, url in overdue:
+            cost = self.pages(url)
+            if cost > remaining:
+                metrics.incr("polls_over_budget")
+                continue
+            remaining -= cost
+            selected.append(url)
+        return selected
+
+    def record(self, urls, listings, polled_at):
+        """
+        Learn from a finished poll and charge its page loads to today's budget.
+
+        Args:
+            urls (list): Searches that were crawled
+            listings (iterable): Listings the crawl returned, with their source_urls
+            polled_at (float): Timestamp the crawl started at
+        """
+        found = {url: {} for url in urls}
+        for listing in listings:
+            if listing.recommended:
+                continue
+            for url in listing.source_urls:
+                if url in found:
+                    found[url][listing.id] = listing
+
+        for url, items in found.items():
+            search = self._search(url)
+            self._learn_rates(search, items.values(), polled_at, self.window_hours(url))
+            pages = min(MAX_PAGES, max(1, math.ceil(len(items) / LISTINGS_PER_PAGE)))
+            search["pages"] += ARRIVAL_SMOOTHING * (pages - search["pages"])
+            search["last_polled"] = polled_at
+
+        self._roll_day(polled_at)
+        self.spent += metrics.count("pages_fetched") + metrics.count("pages_not_modified")
+        self.save()
+
+    def watch(self, urls, listings):
+        """
+        Pass a listing stream through and record() the poll once it completes.
+
+        A crawl that fails half way is not recorded, so its searches stay due.
+        """
+        polled_at = time.time()
+        seen = []
+        for listing in listings:
+            seen.append(listing)
+            yield listing
+        self.record(urls, seen, polled_at)
+
+    def _learn_rates(self, search, items, polled_at, window_hours):
+        # Listings older than the search's window are never returned, so that bounds what a poll can observe
+        start = max(search["last_polled"] or 0, polled_at - window_hours * 3600)
+
+        exposure = [0.0] * 24
+        t = start
+        while t < polled_at:
+            local = datetime.fromtimestamp(t, TIMEZONE)
+            next_hour = (local.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)).timestamp()
+            end = min(next_hour, polled_at)
+            exposure[local.hour] += (end - t) / 3600
+            t = end
+
+        arrivals = [0] * 24
+        for listing in items:
+            if listing.age_minutes is None:
+                continue
+            posted = polled_at - listing.age_minutes * 60
+            if posted >= start:
+                arrivals[datetime.fromtimestamp(posted, TIMEZONE).hour] += 1
+
+        rates = search["rates"]
+        for hour in range(24):
+            if exposure[hour] <= 0:
+                continue
+            observed = arrivals[hour] / exposure[hour]
+            old = rates[hour] if rates[hour] is not None else ARRIVAL_PRIOR_PER_HOUR
+            # A few minutes of exposure says less about an hour than a full hour of it
+            rates[hour] = old + ARRIVAL_SMOOTHING * min(1.0, exposure[hour]) * (observed - old)
+
+    def _roll_day(self, now):
+        day = datetime.fromtimestamp(now, TIMEZONE).strftime("%Y-%m-%d")
+        if day != self.day:
+            self.day = day
+            self.spent = 0
@@ -0,0 +1,190 @@
+import os
+from urllib.parse import urlsplit, parse_qs
+
+from config import PROFILES, SEARCH_MODE, CITY_DISTRICTS, METRO_STATIONS, RENT_RANGE, MIN_PING, MAX_PING, KINDS, NEW_WITHIN_HOURS, LISTING_FILTERS, LISTING_SCORE, LISTING_TOP_N
+from app.libs.ranking import rank_listings
+
+# Seen-store scope of the single search built from the global settings
+DEFAULT_SCOPE = "default"
+
+# Query parameter names of the (main, sub) area filter per search mode
+AREA_PARAMS = {
+    "metro": ("metro", "station"),
+    "district": ("region", "section"),
+}
+
+
+class Profile:
+    """
+    One subscriber: search filters plus the LINE recipient to notify.
+
+    Attributes:
+        name (str): Unique name, also the profile's scope in the seen-ID store
+        search_mode (str): "metro" or "district"
+        areas (dict): Metro line / city code -> list of station / district codes
+        rent_range (tuple): (min, max) monthly rent
+        min_ping (float): Minimum floor area in 坪
+        max_ping (float): Maximum floor area in 坪
+        kinds (list): 591 kind codes
+        new_within_hours (int): Only listings posted within this many hours
+        line_to (str): LINE user / group ID, None for the default recipient
+        filters (dict): Post-filters the query string cannot express, see rank_listings()
+        score (str): Ranking expression, None keeps discovery order
+        top_n (int): Push at most this many new listings per run, None for all
+    """
+
+    __slots__ = ("name", "search_mode", "areas", "rent_range", "min_ping", "max_ping", "kinds", "new_within_hours", "line_to", "filters", "score", "top_n")
+
+    def __init__(self, name, search_mode=SEARCH_MODE, areas=None, rent_range=RENT_RANGE, min_ping=MIN_PING, max_ping=MAX_PING, kinds=KINDS, new_within_hours=NEW_WITHIN_HOURS, line_to=None,
+                 filters=LISTING_FILTERS, score=LISTING_SCORE, top_n=LISTING_TOP_N):
+        if search_mode not in AREA_PARAMS:
+            raise ValueError(f"Invalid SEARCH_MODE: {search_mode}")
+        if areas is None:
+            areas = METRO_STATIONS if search_mode == "metro" else CITY_DISTRICTS
+
+        self.name = name
+        self.search_mode = search_mode
+        self.areas = {str(main): [str(sub) for sub in subs] for main, subs in areas.items()}
+        self.rent_range = tuple(rent_range)
+        self.min_ping = min_ping
+        self.max_ping = max_ping
+        self.kinds = [str(kind) for kind in kinds]
+        self.new_within_hours = new_within_hours
+        self.line_to = line_to
+        self.filters = dict(filters or {})
+        self.score = score
+        self.top_n = top_n
+
+    def __repr__(self):
+        return f"Profile(name={self.name}, search_mode={self.search_mode}, rent_range={self.rent_range}, kinds={self.kinds})"
+
+    def matches(self, listing):
+        """
+        Whether a listing satisfies this profile's filters.
+
+        The shared query a listing came from is a superset of this profile's
+        search, so every filter is re-checked here. Fields the list page did
+        not show (None) are not held against the listing. A listing found by
+        several shared queries matches if any of them covers this profile.
+        """
+        if listing.kind is not None and listing.kind not in self.kinds:
+            return False
+        if listing.price is not None and not self.rent_range[0] <= listing.price <= self.rent_range[1]:
+            return False
+        if listing.ping is not None and not self.min_ping <= listing.ping <= self.max_ping:
+            return False
+        if listing.age_minutes is not None and listing.age_minutes > self.new_within_hours * 60:
+            return False
+        if not listing.source_urls:
+            return True
+        return any(self._covers(url) for url in listing.source_urls)
+
+    def serves(self, url):
+        """Whether listings found by search `url` can be meant for this profile"""
+        kind = parse_qs(urlsplit(url).query).get("kind", [None])[0] if url else None
+        return (kind is None or kind in self.kinds) and self._covers(url)
+
+    def _covers(self, source_url):
+        """Whether every area searched by `source_url` is one of this profile's areas"""
+        if not source_url:
+            return True
+        main_key, sub_key = AREA_PARAMS[self.search_mode]
+        query = parse_qs(urlsplit(source_url).query)
+        main = query.get(main_key, [None])[0]
+        if main not in self.areas:
+            return False
+        subs = query.get(sub_key, [""])[0].split(",")
+        return set(subs) <= set(self.areas[main])
+
+    def rank(self, listings):
+        """
+        Apply the profile's post-filters and ranking.
+
+        Returns:
+            list: Kept listings, best first
+        """
+        return rank_listings(listings, self.filters, self.score)
+
+    def select(self, items):
+        """
+        Returns:
+            dict: The listings of `items` (ID -> Listing) this profile wants, best first
+        """
+        if not items:
+            return {}
+        return {listing.id: listing for listing in self.rank(listing for listing in items.values() if self.matches(listing))}
+
+
+def load_profiles():
+    """
+    Build the profiles from PROFILES in config.py.
+
+    Keys a profile leaves out fall back to the global search settings, and
+    "line_to_env" names the environment variable holding its LINE recipient.
+    Without PROFILES, the global settings form a single default profile.
+
+    Returns:
+        list: Profile objects
+    """
+    if not PROFILES:
+        return [Profile(DEFAULT_SCOPE)]
+
+    profiles = []
+    names = set()
+    for settings in PROFILES:
+        settings = dict(settings)
+        line_to_env = settings.pop("line_to_env", None)
+        if line_to_env and "line_to" not in settings:
+            settings["line_to"] = os.getenv(line_to_env)
+        profile = Profile(**settings)
+        if profile.name in names:
+            raise ValueError(f"Duplicate profile name: {profile.name}")
+        names.add(profile.name)
+        profiles.append(profile)
+    return profiles
+
+
+def search_window_hours(profiles=None):
+    """The widest NEW_WITHIN_HOURS any profile asks for"""
+    return max(profile.new_within_hours for profile in profiles or load_profiles())
+
+
+def merge_queries(profiles):
+    """
+    Merge the profiles' searches into the fewest shared queries.
+
+    Searches are grouped by (mode, main area, kind). Within a group, stations or
+    districts wanted by exactly the same set of profiles share one query, so
+    the list page tells which profiles a listing can belong to. Each query
+    uses the widest rent and area range of the profiles it serves, and the
+    profiles filter their own listings back out with Profile.matches().
+
+    Returns:
+        list: dicts with mode, main, subs, kind, rent_range and ping_range
+    """
+    groups = {}
+    for profile in profiles:
+        for main, subs in profile.areas.items():
+            for kind in profile.kinds:
+                members = groups.setdefault((profile.search_mode, main, kind), {})
+                for sub in subs:
+                    wanted_by = members.setdefault(sub, [])
+                    if profile not in wanted_by:
+                        wanted_by.append(profile)
+
+    queries = []
+    for (mode, main, kind), members in groups.items():
+        shared = {}
+        for sub, wanted_by in members.items():
+            shared.setdefault(tuple(profile.name for profile in wanted_by), (wanted_by, []))[1].append(sub)
+
+        for wanted_by, subs in shared.values():
+            queries.append({
+                "mode": mode,
+                "main": main,
+                "subs": subs,
+                "kind": kind,
+                "rent_range": (min(p.rent_range[0] for p in wanted_by), max(p.rent_range[1] for p in wanted_by)),
+                "ping_range": (min(p.min_ping for p in wanted_by), max(p.max_ping for p in wanted_by)),
+            })
+    return queries
@@ -0,0 +1,132 @@
+"""
+Columnar filter and rank stage for parsed listings.
+
+Rules the 591 query string cannot express, such as rent per 坪 or leaving
+out top floors, are applied here to whole runs at once. The listings become
+NumPy float arrays (NaN where the list page showed nothing) and filters are
+boolean masks. NumPy is only imported once a run actually has something to
+filter or rank.
+"""
+from operator import attrgetter
+
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+# Listing attributes loaded as columns, plus the derived price_per_ping
+COLUMNS = ("price", "ping", "age_minutes", "floor", "top_floor")
+
+# Filter name -> (column, comparison). A listing is dropped when the comparison
+# holds; a missing value never holds, matching Profile.matches()
+_LIMITS = {
+    "min_price": ("price", "lt"),
+    "max_price": ("price", "gt"),
+    "min_ping": ("ping", "lt"),
+    "max_ping": ("ping", "gt"),
+    "max_age_minutes": ("age_minutes", "gt"),
+    "max_price_per_ping": ("price_per_ping", "gt"),
+}
+
+# Flag filters -> mask of the listings dropped
+_FLAGS = {
+    "exclude_top_floor": lambda columns: columns["floor"] == columns["top_floor"],
+    "exclude_basement": lambda columns: columns["floor"] < 1,
+}
+
+
+def _check_filters(filters):
+    unknown = set(filters) - set(_LIMITS) - set(_FLAGS)
+    if unknown:
+        raise ValueError(f"Unknown listing filters: {', '.join(sorted(unknown))}")
+
+
+def build_columns(listings):
+    """
+    Returns:
+        dict: Column name -> float64 array, NaN for missing values
+    """
+    np = _load_numpy()
+    # One pass over the objects; NumPy turns None into NaN in a float array
+    table = np.array(list(map(attrgetter(*COLUMNS), listings)), dtype=np.float64).reshape(len(listings), len(COLUMNS))
+    columns = {name: np.ascontiguousarray(table[:, i]) for i, name in enumerate(COLUMNS)}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_per_ping = columns["price"] / columns["ping"]
+    price_per_ping[~np.isfinite(price_per_ping)] = np.nan
+    columns["price_per_ping"] = price_per_ping
+    return columns
+
+
+def _mask(columns, filters, count):
+    keep = np.ones(count, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for name, limit in filters.items():
+            if limit is None or limit is False:
+                continue
+            if name in _FLAGS:
+                keep &= ~_FLAGS[name](columns)
+                continue
+            column, op = _LIMITS[name]
+            values = columns[column]
+            keep &= ~(values < limit if op == "lt" else values > limit)
+    return keep
+
+
+def _score(code, namespace):
+    return eval(code, {"__builtins__": {}}, namespace)
+
+
+def _rank(listings, filters, score, top_n):
+    columns = build_columns(listings)
+    index = np.flatnonzero(_mask(columns, filters, len(listings)))
+
+    if score:
+        namespace = dict(columns, log=np.log, sqrt=np.sqrt, abs=np.abs, minimum=np.minimum, maximum=np.maximum)
+        with np.errstate(all="ignore"):
+            scores = np.broadcast_to(np.asarray(_score(score, namespace), dtype=np.float64), (len(listings),))[index]
+        # Listings the expression could not score go last
+        scores = np.where(np.isnan(scores), -np.inf, scores)
+        if top_n and top_n < len(index):
+            best = np.argpartition(-scores, top_n - 1)[:top_n]
+            order = best[np.argsort(-scores[best], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+        index = index[order]
+
+    if top_n:
+        index = index[:top_n]
+    return [listings[i] for i in index]
+
+
+def rank_listings(listings, filters=None, score=None, top_n=None):
+    """
+    Filter listings and sort them by a score, best first.
+
+    Args:
+        listings (iterable): Listings to rank
+        filters (dict): Filter name -> limit, see _LIMITS and _FLAGS. Missing
+            values on a listing never fail a filter
+        score (str): Expression over the columns (price, ping, age_minutes,
+            floor, top_floor, price_per_ping) and log / sqrt / abs / minimum /
+            maximum, e.g. "-price_per_ping - age_minutes / 30". Higher is better.
+            None keeps the input order
+        top_n (int): Keep only this many, None for all
+
+    Returns:
+        list: The kept listings in rank order
+    """
+    listings = list(listings)
+    filters = filters or {}
+    _check_filters(filters)
+    if not listings:
+        return []
+    if not score and not top_n and not any(limit is not None and limit is not False for limit in filters.values()):
+        return listings
+    score = compile(score, "<score>", "eval") if score else None
+    return _rank(listings, filters, score, top_n)
+
@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from config import REQUESTS_PER_SECOND, RATE_BURST, REQUEST_JITTER_SECONDS, BACKOFF_BASE, BACKOFF_MAX
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens per second up to `capacity`.
+
+    acquire() reserves a token under the lock and sleeps outside it, so
+    concurrent callers queue up fairly instead of spinning.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and return the seconds waited"""
+        if self.rate <= 0:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """
+    Keep one token bucket per host so every worker shares the same budget.
+
+    Each request also waits a random 0..`jitter` seconds on top, so request
+    timing does not look machine-regular. A rate of 0 turns pacing off
+    entirely, jitter included.
+    """
+
+    def __init__(self, rate, burst, jitter=0.0):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        if self.rate <= 0:
+            return 0.0
+
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        waited = bucket.acquire()
+        if self.jitter > 0:
+            delay = random.uniform(0, self.jitter)
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """
+    Exponential backoff with full jitter
+
+    Args:
+        attempt (int): Zero-based retry number
+        base (float): Delay of the first retry in seconds
+        cap (float): Upper bound for any single delay
+
+    Returns:
+        float: Seconds to sleep before the next attempt
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+limiter = RateLimiter(REQUESTS_PER_SECOND, RATE_BURST, REQUEST_JITTER_SECONDS)
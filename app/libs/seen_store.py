@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import time
+
+from config import SEEN_STORE_FILE, SEEN_TTL_DAYS
+from app.libs.profiles import DEFAULT_SCOPE
+
+LEGACY_PUSHED_ITEMS_FILE = "pushed_items.json"
+
+# SQLite's default limit on bound parameters per statement
+_CHUNK = 900
+
+
+class SeenStore:
+    """
+    SQLite-backed set of listing IDs that were already pushed to LINE.
+
+    Each profile has its own scope, so a listing pushed to one subscriber is
+    still new to the others. IDs are stored as integers in a WITHOUT ROWID
+    table keyed by (scope, id), so lookups hit the primary key index and new IDs are plain INSERTs instead of a full file
+    rewrite. IDs older than `ttl_days` are expired on open so the file stays
+    flat as history grows. The first open imports the old pushed_items.json.
+    """
+
+    def __init__(self, path=SEEN_STORE_FILE, ttl_days=SEEN_TTL_DAYS, legacy_file=LEGACY_PUSHED_ITEMS_FILE):
+        self.path = path
+        self.ttl_days = ttl_days
+        self.conn = sqlite3.connect(path)
+        # Must be set before the first table is created to take effect
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._add_scope()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            "scope TEXT NOT NULL, id INTEGER NOT NULL, seen_at INTEGER NOT NULL, PRIMARY KEY (scope, id)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+        self._migrate(legacy_file)
+        self.expire()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _add_scope(self):
+        """Move a store from before profiles existed into the default scope"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(seen)")]
+        if not columns or "scope" in columns:
+            return
+
+        self.conn.execute("ALTER TABLE seen RENAME TO seen_unscoped")
+        self.conn.execute(
+            "CREATE TABLE seen ("
+            "scope TEXT NOT NULL, id INTEGER NOT NULL, seen_at INTEGER NOT NULL, PRIMARY KEY (scope, id)"
+            ") WITHOUT ROWID"
+        )
+        moved = self.conn.execute(
+            "INSERT INTO seen (scope, id, seen_at) SELECT ?, id, seen_at FROM seen_unscoped", (DEFAULT_SCOPE,)
+        ).rowcount
+        self.conn.execute("DROP TABLE seen_unscoped")
+        self.conn.commit()
+        print(f"[SeenStore] Moved {moved} IDs into the '{DEFAULT_SCOPE}' scope")
+
+    def _migrate(self, legacy_file):
+        """Import pushed_items.json once, then never read it again"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+            return
+
+        if legacy_file and os.path.exists(legacy_file):
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                legacy_ids = json.load(f).get("pushed_ids", [])
+            added = self.add_many(legacy_ids, commit=False)
+            print(f"[SeenStore] Migrated {added} IDs from {legacy_file}")
+
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)", (str(int(time.time())),))
+        self.conn.commit()
+
+    def expire(self):
+        """Drop IDs older than the TTL and give the freed pages back to the OS"""
+        if not self.ttl_days:
+            return 0
+
+        cutoff = int(time.time()) - int(self.ttl_days * 86400)
+        removed = self.conn.execute("DELETE FROM seen WHERE seen_at < ?", (cutoff,)).rowcount
+        self.conn.commit()
+        if removed:
+            self.conn.execute("PRAGMA incremental_vacuum")
+            print(f"[SeenStore] Expired {removed} IDs older than {self.ttl_days} days")
+        return removed
+
+    def contains(self, item_id, scope=DEFAULT_SCOPE):
+        item_id = _to_int(item_id)
+        if item_id is None:
+            return False
+        return self.conn.execute("SELECT 1 FROM seen WHERE scope = ? AND id = ?", (scope, item_id)).fetchone() is not None
+
+    def filter_new(self, item_ids, scope=DEFAULT_SCOPE):
+        """
+        Return the IDs that have not been pushed to `scope` yet, keeping their order.
+        """
+        item_ids = list(item_ids)
+        keys = {item_id: _to_int(item_id) for item_id in item_ids}
+        candidates = [key for key in keys.values() if key is not None]
+
+        seen = set()
+        for i in range(0, len(candidates), _CHUNK):
+            chunk = candidates[i:i + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"SELECT id FROM seen WHERE scope = ? AND id IN ({placeholders})", [scope] + chunk)
+            seen.update(row[0] for row in rows)
+
+        return [item_id for item_id in item_ids if keys[item_id] not in seen]
+
+    def add_many(self, item_ids, scope=DEFAULT_SCOPE, commit=True):
+        """
+        Record IDs as pushed to `scope`. Already known IDs are left untouched.
+
+        Returns:
+            int: Number of newly recorded IDs
+        """
+        now = int(time.time())
+        rows = [(scope, key, now) for key in map(_to_int, item_ids) if key is not None]
+        before = self.conn.total_changes
+        self.conn.executemany("INSERT OR IGNORE INTO seen (scope, id, seen_at) VALUES (?, ?, ?)", rows)
+        if commit:
+            self.conn.commit()
+        return self.conn.total_changes - before
+
+    def ids(self, scope=None):
+        """Return the IDs stored for `scope` (every scope if None) as ints, matching Listing.id"""
+        if scope is None:
+            return {row[0] for row in self.conn.execute("SELECT DISTINCT id FROM seen")}
+        return {row[0] for row in self.conn.execute("SELECT id FROM seen WHERE scope = ?", (scope,))}
+
+
+def _to_int(item_id):
+    try:
+        return int(item_id)
+    except (TypeError, ValueError):
+        print(f"[SeenStore] Ignoring non-numeric ID: {item_id}")
+        return None
@@ -0,0 +1,80 @@
+import threading
+import traceback
+
+from config import SESSION_MAX_PAGES, SESSION_MAX_RSS_MB
+from app.libs.metrics import metrics
+
+
+class SessionManager:
+    """
+    Keeps fetch backends warm between scheduled runs of a long-lived process.
+
+    acquire() hands out an idle backend after a health check, or starts a new
+    one. release() puts it back unless it has served `max_pages` pages or its
+    browser grew past `max_rss_mb`, in which case it is recycled. A backend
+    that crashed is dropped by the caller and replaced on the next acquire().
+    """
+
+    def __init__(self, factory, max_pages=SESSION_MAX_PAGES, max_rss_mb=SESSION_MAX_RSS_MB):
+        self.factory = factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Returns:
+            SeleniumBackend | HttpBackend: A healthy backend, or None if none could be started
+        """
+        while True:
+            with self.lock:
+                fetcher = self.idle.pop() if self.idle else None
+            if fetcher is None:
+                break
+            if fetcher.is_alive():
+                metrics.incr("sessions_reused")
+                return fetcher
+            print("[Session] Idle session failed its health check, restarting it")
+            metrics.incr("sessions_crashed")
+            self.discard(fetcher)
+
+        metrics.incr("sessions_started")
+        return self.factory()
+
+    def release(self, fetcher):
+        """Return a backend after a run, recycling it if it is worn out"""
+        if not fetcher:
+            return
+
+        reason = None
+        if self.max_pages and fetcher.pages >= self.max_pages:
+            reason = f"served {fetcher.pages} pages"
+        else:
+            rss = fetcher.rss_mb()
+            if self.max_rss_mb and rss is not None and rss > self.max_rss_mb:
+                reason = f"using {rss:.0f}MB"
+
+        if reason:
+            print(f"[Session] Recycling {fetcher.name} session: {reason}")
+            metrics.incr("sessions_recycled")
+            self.discard(fetcher)
+            return
+
+        with self.lock:
+            self.idle.append(fetcher)
+
+    def discard(self, fetcher):
+        try:
+            fetcher.quit()
+        except Exception as e:
+            print(f"[Session] Failed to quit session: {str(e)}")
+            traceback.print_exc()
+
+    def close(self):
+        """Quit every idle backend, e.g. on process shutdown"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for fetcher in idle:
+            self.discard(fetcher)
+        print(f"[Session] Closed {len(idle)} warm sessions")
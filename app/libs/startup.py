@@ -0,0 +1,66 @@
+"""
+Per-module import cost of an entry point, from `python -X importtime`.
+
+    python main_github_action.py --profile-startup
+"""
+import subprocess
+import sys
+
+
+def import_times(argv):
+    """
+    Run a script in a fresh interpreter under -X importtime.
+
+    Args:
+        argv (list): Script and its arguments, e.g. ["main_github_action.py", "--dry-run"]
+
+    Returns:
+        tuple: (list of (module, self µs, cumulative µs) in import order,
+        the child's exit code). The child's own output goes to this terminal.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", *argv], stderr=subprocess.PIPE, text=True)
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            # Anything else on stderr belongs to the child, e.g. a traceback
+            print(line, file=sys.stderr)
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            # The "self [us] | cumulative | imported package" header
+            continue
+    return modules, result.returncode
+
+
+def print_import_report(modules, limit=20):
+    """
+    Print where import time went: totals per top-level package, then the
+    slowest individual modules by their own (self) time.
+    """
+    total = sum(self_us for _, self_us, _ in modules)
+    if not total:
+        print("[Startup] No imports recorded")
+        return
+
+    packages = {}
+    for name, self_us, _ in modules:
+        package = name.split(".")[0]
+        count, spent = packages.get(package, (0, 0))
+        packages[package] = (count + 1, spent + self_us)
+
+    print(f"[Startup] {len(modules)} modules imported in {total / 1000:.1f}ms")
+    header = f"{'package':<32} {'modules':>8} {'ms':>9} {'share':>7}"
+    print(header)
+    print("-" * len(header))
+    for package, (count, spent) in sorted(packages.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+        print(f"{package:<32} {count:>8} {spent / 1000:>9.1f} {spent / total:>7.1%}")
+
+    print()
+    header = f"{'module':<48} {'self ms':>9} {'cumulative ms':>14}"
+    print(header)
+    print("-" * len(header))
+    for name, self_us, cumulative_us in sorted(modules, key=lambda row: row[1], reverse=True)[:limit]:
+        print(f"{name:<48} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
@@ -1,15 +1,14 @@
-import sys
 import traceback
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import WebDriverException, TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
 import time
-import os
-import json
 
-PUSHED_ITEMS_FILE = "pushed_items.json"
+from config import FETCH_BACKEND, HTTP_POOL_SIZE, HTTP_TIMEOUT, PAGE_READY_TIMEOUT, BLOCK_RESOURCES, BLOCKED_URL_PATTERNS, ALLOWED_URL_PATTERNS, REPORT_PAGE_BYTES
+from app.libs.fetchers import SeleniumBackend, HttpBackend, NOT_MODIFIED, block_urls
+from app.libs.rate_limit import limiter, backoff_delay
+from app.libs.seen_store import SeenStore
+from app.libs.profiles import DEFAULT_SCOPE, load_profiles
+from app.libs.parsing import parse_html
+from app.libs.listing import render_listing
+from app.libs.metrics import metrics
 
 def get_driver():
     """
@@ -18,7 +17,13 @@ def get_driver():
     Returns:
         WebDriver: Configured Chrome WebDriver instance or None if initialization fails
     """
+    # Only the selenium backend needs Selenium at all
+    from selenium.common.exceptions import WebDriverException
+
     try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
         options = Options()
         options.add_argument('--headless')
         options.add_argument('--disable-notifications')
@@ -26,13 +31,25 @@ def get_driver():
         options.add_argument('--disable-extensions')
         options.add_argument('--no-sandbox')
         options.add_argument('--disable-dev-shm-usage')
-        options.add_experimental_option("prefs", {
+        prefs = {
             "profile.managed_default_content_settings.javascript": 2
-        })
+        }
+        if BLOCK_RESOURCES:
+            prefs["profile.managed_default_content_settings.images"] = 2
+            options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option("prefs", prefs)
+        if REPORT_PAGE_BYTES:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
         
         # Create the driver with a service object for better error handling
-        driver = webdriver.Chrome(options=options)
-        driver.implicitly_wait(10)
+        with metrics.timer("driver_startup"):
+            driver = webdriver.Chrome(options=options)
+        if BLOCK_RESOURCES:
+            patterns = blocked_url_patterns()
+            block_urls(driver, patterns)
+            print(f"[Utils] Blocking {len(patterns)} URL patterns")
+        # Page readiness is handled by explicit waits in SeleniumBackend
+        driver.implicitly_wait(0)
         driver.set_page_load_timeout(30)  # Set page load timeout to 30 seconds
         print("[Utils] WebDriver initialized successfully")
         return driver
@@ -45,97 +62,207 @@ def get_driver():
         traceback.print_exc()
         return None
 
-def get_page_content(driver, url, max_retries=3):
+def blocked_url_patterns():
+    """
+    BLOCKED_URL_PATTERNS minus anything listed in ALLOWED_URL_PATTERNS.
+
+    CDP has no allow rules, so allowing a pattern means not blocking it.
+    """
+    allowed = set(ALLOWED_URL_PATTERNS)
+    return [pattern for pattern in BLOCKED_URL_PATTERNS if pattern not in allowed]
+
+def get_fetcher(backend=None):
+    """
+    Create the fetch backend selected by FETCH_BACKEND in config.py
+    
+    Args:
+        backend (str): Override the configured backend ("selenium" or "http")
+        
+    Returns:
+        SeleniumBackend | HttpBackend: Ready-to-use backend or None if initialization fails
+    """
+    backend = backend or FETCH_BACKEND
+    if backend == "http":
+        print("[Utils] Using HTTP fetch backend")
+        return HttpBackend(pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT)
+    if backend == "selenium":
+        driver = get_driver()
+        if not driver:
+            return None
+        return SeleniumBackend(
+            driver,
+            ready_timeout=PAGE_READY_TIMEOUT,
+            report_bytes=REPORT_PAGE_BYTES,
+        )
+
+    print(f"[Error] Invalid FETCH_BACKEND: {backend}")
+    return None
+
+def get_page_content(fetcher, url, max_retries=3, validators=None, raw=False):
     """
     Fetch and parse the content of a webpage
     
     Args:
-        driver (WebDriver): Selenium WebDriver instance
+        fetcher (SeleniumBackend | HttpBackend | WebDriver): Fetch backend, a bare WebDriver is wrapped automatically
         url (str): URL to fetch
         max_retries (int): Maximum number of retry attempts
+        validators (dict): Cached ETag / Last-Modified for a conditional request (HTTP backend only)
+        raw (bool): Return the HTML string unparsed, e.g. for a ParsePool
         
     Returns:
-        BeautifulSoup: Parsed HTML content or None if fetching fails
+        BeautifulSoup | SelectolaxNode: Parsed HTML content (see app.libs.parsing), the HTML
+        string if `raw`, NOT_MODIFIED if the conditional request returned 304, or None if fetching fails
     """
-    if not driver:
-        print("[Error] WebDriver is not initialized")
+    if not fetcher:
+        print("[Error] Fetch backend is not initialized")
         return None
         
     if not url or not isinstance(url, str):
         print("[Error] Invalid URL provided")
         return None
+
+    if not hasattr(fetcher, "fetch"):
+        fetcher = SeleniumBackend(fetcher, ready_timeout=PAGE_READY_TIMEOUT)
+
+    # Each backend names the exceptions it raises, so Selenium and requests are only imported by their own backend
+    timeout_errors = getattr(fetcher, "timeout_errors", ())
+    request_errors = getattr(fetcher, "request_errors", ())
     
     retry_count = 0
     while retry_count < max_retries:
+        if retry_count:
+            time.sleep(backoff_delay(retry_count - 1))
         try:
+            limiter.acquire(url)
             print(f'[Crawler] Fetching: {url} (Attempt {retry_count + 1}/{max_retries})')
-            driver.get(url)
-            
-            # Wait a bit for any dynamic content to load
-            time.sleep(2)
-            
-            # Check if page loaded successfully
-            if "Error" in driver.title or "404" in driver.title:
-                print(f"[Warning] Page may have error: {driver.title}")
-            
-            html_content = driver.page_source
+            with metrics.timer("page_fetch"):
+                html_content = fetcher.fetch(url, validators)
+            if html_content is NOT_MODIFIED:
+                print(f"[Crawler] Not modified since last run: {url}")
+                metrics.incr("pages_not_modified")
+                return NOT_MODIFIED
             if not html_content or len(html_content) < 100:
                 print("[Warning] Page content seems too short, might be incomplete")
                 retry_count += 1
-                time.sleep(2)
+                metrics.incr("fetch_retries")
                 continue
-                
-            return BeautifulSoup(html_content, 'html.parser')
+
+            metrics.incr("pages_fetched")
+            if raw:
+                return html_content
+            with metrics.timer("html_parse"):
+                return parse_html(html_content)
             
-        except TimeoutException:
+        except timeout_errors:
             print(f"[Error] Timeout while loading {url}")
             retry_count += 1
-            time.sleep(2)
-            
-        except WebDriverException as e:
-            print(f"[Error] WebDriver exception while fetching {url}: {str(e)}")
+            metrics.incr("fetch_retries")
+
+        except request_errors as e:
+            print(f"[Error] {fetcher.name} exception while fetching {url}: {str(e)}")
             retry_count += 1
-            time.sleep(2)
+            metrics.incr("fetch_retries")
             
         except Exception as e:
             print(f"[Error] Unexpected error fetching {url}: {str(e)}")
             traceback.print_exc()
             retry_count += 1
-            time.sleep(2)
+            metrics.incr("fetch_retries")
     
     print(f"[Error] Failed to fetch {url} after {max_retries} attempts")
+    metrics.incr("fetch_failures")
     return None
 
-def concat_items(items: dict):
+def unpushed_ids(items: dict, scope=DEFAULT_SCOPE, limit=None):
+    """
+    IDs of the listings in `items` not yet pushed to `scope`, in order.
+
+    Nothing is recorded; call save_pushed_item() once they were delivered.
+
+    Args:
+        items (dict): ID -> Listing, in the order they should be pushed
+        scope (str): Seen-store scope, i.e. the profile name
+        limit (int): Only take the first `limit` new listings
+    """
+    if not items:
+        return []
+    with metrics.timer("dedup"), SeenStore() as store:
+        return store.filter_new(items.keys(), scope)[:limit]
+
+def new_entries(items: dict, scope=DEFAULT_SCOPE, limit=None):
+    """
+    Record the listings not yet pushed to `scope` and render them.
+
+    They count as pushed from here on, whether or not the push succeeds; the
+    entry points use pipeline.push_new_listings(), which records only what LINE accepted.
+
+    Args:
+        items (dict): ID -> Listing, in the order they should be pushed
+        scope (str): Seen-store scope, i.e. the profile name
+        limit (int): Only take the first `limit` new listings; the rest stay
+            unpushed and compete again next run
+
+    Returns:
+        list: One message block per new listing, for push_entries()
+    """
     if not items or not isinstance(items, dict):
         print("[Error] Invalid items provided for concatenation")
-        return ""
+        return []
     
-    pushed_items = load_pushed_items()
-    items_keys = list(items.keys())
+    with metrics.timer("dedup"), SeenStore() as store:
+        new_items_keys = store.filter_new(items.keys(), scope)[:limit]
+        entries = [render_listing(items[item_id]) for item_id in new_items_keys]
+        store.add_many(new_items_keys, scope)
 
-    new_items_keys = list(set(items_keys) - set(pushed_items))
+    metrics.incr("listings_new", len(new_items_keys))
 
-    message = ""
-    for item_id in new_items_keys:
-        message += items[item_id] + "\n"
-    
-    save_pushed_item(new_items_keys)
-    return message
+    print(f"[Info] Pushed items saved: {new_items_keys}")
+    return entries
 
+def concat_items(items: dict, scope=DEFAULT_SCOPE):
+    """Same as new_entries(), joined into one message string"""
+    return "".join(entry + "\n" for entry in new_entries(items, scope))
 
-def load_pushed_items():
-    """Load the list of pushed items from the JSON file"""
-    if os.path.exists(PUSHED_ITEMS_FILE):
-        with open(PUSHED_ITEMS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)["pushed_ids"]
-    else:
-        return []
 
-def save_pushed_item(items_id: list):
-    """Save a new pushed item ID to the JSON file"""
-    pushed_items = load_pushed_items()
-    pushed_items.extend(items_id)
-    with open(PUSHED_ITEMS_FILE, "w", encoding="utf-8") as f:
-        json.dump({"pushed_ids": pushed_items}, f, ensure_ascii=False, indent=4)
+class PushedIds:
+    """
+    IDs (ints) already pushed to each profile, for the all-seen pagination stop.
+
+    Merged search URLs serve several profiles, so a listing only counts as
+    seen on a URL once it was pushed to every profile that URL serves.
+    """
+
+    def __init__(self, scopes):
+        """
+        Args:
+            scopes (list): (Profile, set of pushed IDs) pairs
+        """
+        self.scopes = scopes
+        self.served = {}
+
+    def __bool__(self):
+        return any(ids for _, ids in self.scopes)
+
+    def served_by(self, url):
+        """Pushed-ID sets of the profiles search `url` serves"""
+        sets = self.served.get(url)
+        if sets is None:
+            sets = self.served[url] = [ids for profile, ids in self.scopes if profile.serves(url)]
+        return sets
+
+    def all_pushed(self, url, ids):
+        """Whether every ID in `ids` was pushed to every profile `url` serves"""
+        sets = self.served_by(url)
+        return bool(sets) and all(id in pushed for pushed in sets for id in ids)
+
+def load_pushed_ids(profiles=None):
+    """Load the IDs pushed to each profile from the seen-ID store"""
+    profiles = load_profiles() if profiles is None else profiles
+    with SeenStore() as store:
+        return PushedIds([(profile, store.ids(profile.name)) for profile in profiles])
+
+def save_pushed_item(items_id: list, scope=DEFAULT_SCOPE):
+    """Append newly pushed item IDs to the seen-ID store"""
+    with SeenStore() as store:
+        store.add_many(items_id, scope)
     print(f"[Info] Pushed items saved: {items_id}")
\ No newline at end of file
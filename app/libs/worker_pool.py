@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+
+from app.libs.metrics import metrics
+from app.libs.rate_limit import backoff_delay
+
+_STOP = object()
+
+
+class CrawlPool:
+    """
+    A fixed pool of worker threads, each owning one fetch backend for its lifetime.
+
+    Work is submitted as (url, page) tasks through a bounded queue. The handler
+    decides whether a follow-up page should be crawled, so pagination still
+    happens on discovery while different URLs run side by side.
+
+    A handler that finishes its task elsewhere (e.g. on a ParsePool) returns
+    a Future instead; the worker moves on to its next task right away and
+    the result is reported once the future is done. Only the handler call
+    itself is retried.
+    """
+
+    def __init__(self, fetcher_factory, handler, workers=3, queue_size=10, max_retries=2, release=None, on_failure=None):
+        """
+        Args:
+            fetcher_factory (callable): Returns a new fetch backend, or None on failure
+            handler (callable): handler(fetcher, url, page) -> (items, has_next), or a Future of it
+            workers (int): Number of backends / threads to run
+            queue_size (int): Maximum number of tasks waiting for a worker
+            max_retries (int): Extra attempts per task before giving up, with backoff in between
+            release (callable): Called with each healthy backend when the run ends, defaults to quitting it
+            on_failure (callable): Called with (url, page) of every task given up on
+        """
+        self.fetcher_factory = fetcher_factory
+        self.release = release or _quit
+        self.on_failure = on_failure
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_retries = max(0, max_retries)
+        self.tasks = queue.Queue(maxsize=max(1, queue_size))
+        self.results = queue.Queue()
+        self.threads = []
+
+    def _worker(self, index):
+        fetcher = self.fetcher_factory()
+        if not fetcher:
+            print(f"[Pool] Worker {index} could not start a fetch backend")
+
+        while True:
+            task = self.tasks.get()
+            if task is _STOP:
+                break
+
+            url, page = task
+            result, ok = None, False
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    time.sleep(backoff_delay(attempt - 1))
+                if not fetcher:
+                    fetcher = self.fetcher_factory()
+                    if not fetcher:
+                        continue
+                try:
+                    result = self.handler(fetcher, url, page)
+                    ok = True
+                    break
+                except Exception as e:
+                    metrics.incr("task_retries")
+                    print(f"[Pool] Worker {index} failed on {url} page {page} "
+                          f"(Attempt {attempt + 1}/{self.max_retries + 1}): {str(e)}")
+                    traceback.print_exc()
+                    # Assume the backend is in a bad state and start a fresh one
+                    _quit(fetcher)
+                    fetcher = None
+
+            if isinstance(result, Future):
+                result.add_done_callback(lambda future, url=url, page=page: self._deferred(index, url, page, future))
+                continue
+            items, has_next = result if ok else (None, False)
+            self.results.put((url, page, items, has_next, ok))
+
+        self.release(fetcher)
+
+    def _deferred(self, index, url, page, future):
+        """Report a task whose handler returned a Future"""
+        try:
+            items, has_next = future.result()
+        except Exception as e:
+            print(f"[Pool] Worker {index} failed on {url} page {page}: {str(e)}")
+            traceback.print_exc()
+            self.results.put((url, page, None, False, False))
+            return
+        self.results.put((url, page, items, has_next, True))
+
+    def run(self, urls):
+        """
+        Crawl every URL starting from page 1 and collect the results.
+
+        Args:
+            urls (list): Search URLs to crawl
+
+        Returns:
+            dict: Merged items from every page that was crawled
+        """
+        items = {}
+        for page_items in self.iter_pages(urls):
+            items.update(page_items)
+        return items
+
+    def iter_pages(self, urls):
+        """
+        Crawl every URL starting from page 1, yielding each page's items as it completes.
+
+        Nothing is kept once a page has been yielded. Closing the generator
+        early stops the workers.
+
+        Args:
+            urls (list): Search URLs to crawl
+
+        Yields:
+            dict: Items of one crawled page
+        """
+        self.threads = [
+            threading.Thread(target=self._worker, args=(i,), daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self.threads:
+            t.start()
+
+        pending = deque((url, 1) for url in urls)
+        in_flight = 0
+
+        try:
+            while pending or in_flight:
+                # Only the coordinator enqueues, so workers never block on a full queue
+                while pending and not self.tasks.full():
+                    self.tasks.put(pending.popleft())
+                    in_flight += 1
+
+                url, page, page_items, has_next, ok = self.results.get()
+                in_flight -= 1
+
+                if not ok:
+                    metrics.incr("task_failures")
+                    print(f"[Error] Giving up on {url} page {page}")
+                    if self.on_failure:
+                        self.on_failure(url, page)
+                    continue
+                if has_next:
+                    pending.append((url, page + 1))
+                if page_items:
+                    yield page_items
+        finally:
+            for _ in self.threads:
+                self.tasks.put(_STOP)
+            for t in self.threads:
+                t.join()
+
+
+def _quit(fetcher):
+    if not fetcher:
+        return
+    try:
+        fetcher.quit()
+    except Exception as e:
+        print(f"[Pool] Failed to quit fetch backend: {str(e)}")
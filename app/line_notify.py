@@ -1,53 +1,179 @@
 import os
 import json
 import sys
-import requests
+import threading
+import time
+import uuid
 import traceback
-from config import SEND_LINE_MESSAGE
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from config import SEND_LINE_MESSAGE, LINE_MAX_MESSAGE_UNITS, LINE_MAX_MESSAGES_PER_PUSH, LINE_CONCURRENCY, LINE_MAX_RETRIES, LINE_TIMEOUT
+from app.libs.metrics import metrics
+from app.libs.rate_limit import backoff_delay
 
-from dotenv import load_dotenv
+LINE_API = "https://api.line.me/v2/bot/message/push"
 
-load_dotenv()
+# Read when sending rather than at import, after the entry point has called load_env()
+LINE_TOKEN_ENV = "LINE_CHANNEL_ACCESS_TOKEN_2"
+LINE_TO_GROUP_ENV = "LINE_TO_GROUP_ID_2"
+LINE_TO_USER_ENV = "LINE_TO_USER_ID_2"
 
-LINE_API = "https://api.line.me/v2/bot/message/push"
-LINE_TO_GROUP = os.getenv("LINE_TO_GROUP_ID_2")
+# Status codes worth retrying: rate limited or a LINE server error
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Longest Retry-After worth sleeping through; a longer one (e.g. the monthly quota) fails the batch
+MAX_RETRY_AFTER = LINE_TIMEOUT * 4
 
-LINE_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN_2")
-LINE_TO_USER = os.getenv("LINE_TO_USER_ID_2")
+_session = None
+_session_lock = threading.Lock()
 
-def split_message_by_entry(message: str, max_length: int = 4000) -> list[str]:
+def get_session():
+    """Shared requests.Session so every push reuses pooled keep-alive connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is only imported once there is something to push
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, LINE_CONCURRENCY))
+            _session.mount("https://", adapter)
+        return _session
+
+def retry_after_seconds(value):
     """
-    將訊息依照「一筆一筆物件」進行分段，避免切到中間。
-    每筆以兩個換行 \n\n 分隔。
+    Parse a Retry-After header, given either in seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or unreadable
     """
-    entries = message.strip().split("\n\n")  # 每筆資料間用兩個換行分隔
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def make_batches(chunks, size=LINE_MAX_MESSAGES_PER_PUSH):
+    """Pack message chunks into lists of at most `size`, the most LINE accepts per push"""
+    size = max(1, size)
+    return [chunks[i:i + size] for i in range(0, len(chunks), size)]
+
+def utf16_len(text: str) -> int:
+    """Length in UTF-16 code units, the unit LINE counts its text limit in"""
+    return len(text.encode("utf-16-le")) // 2
+
+def _hard_split(text: str, max_units: int) -> list[tuple[str, int]]:
+    """Cut a single over-long line every `max_units` code units without splitting a surrogate pair"""
+    pieces = []
+    start = 0
+    units = 0
+    for i, char in enumerate(text):
+        width = 2 if ord(char) > 0xFFFF else 1
+        if units + width > max_units:
+            pieces.append((text[start:i], units))
+            start, units = i, 0
+        units += width
+    if start < len(text):
+        pieces.append((text[start:], units))
+    return pieces
+
+def split_oversized(entry: str, max_units: int) -> list[tuple[str, int]]:
+    """
+    Split an entry that does not fit in one message, at line breaks where possible.
+
+    Returns:
+        list: (piece, units) pairs, each piece at most `max_units` long
+    """
+    pieces = []
+    current = []
+    current_units = 0
+    for line in entry.split("\n"):
+        for part, units in (_hard_split(line, max_units) if utf16_len(line) > max_units else [(line, utf16_len(line))]):
+            extra = units + (1 if current else 0)
+            if current and current_units + extra > max_units:
+                pieces.append(("\n".join(current), current_units))
+                current, current_units, extra = [], 0, units
+            current.append(part)
+            current_units += extra
+    if current:
+        pieces.append(("\n".join(current), current_units))
+    return pieces
+
+def build_chunks(entries, max_units: int = LINE_MAX_MESSAGE_UNITS, separator: str = "\n\n") -> list[str]:
+    """
+    將一筆一筆物件打包成 LINE 訊息，避免切到中間。
+
+    Single pass over the entries: each one is measured once and every chunk
+    is joined once, so the cost is linear in the total text. Entries longer
+    than a whole message are split at line breaks (or hard cut) on their own.
+
+    Args:
+        entries (iterable): Message blocks, e.g. the header, one per listing and the footer
+        max_units (int): Maximum UTF-16 code units per message
+        separator (str): Text placed between entries in the same message
+
+    Returns:
+        list[str]: Message texts
+    """
+    return pack_chunks(entries, max_units, separator)[0]
+
+def pack_chunks(entries, max_units: int = LINE_MAX_MESSAGE_UNITS, separator: str = "\n\n"):
+    """
+    build_chunks(), also telling which entries ended up in which chunk.
+
+    Returns:
+        tuple: (chunks, owners) where owners[i] is the set of entry indexes
+        with text in chunks[i]
+    """
+    separator_units = utf16_len(separator)
     chunks = []
-    current_chunk = ""
+    owners = []
+    current = []
+    current_owners = set()
+    current_units = 0
 
-    for entry in entries:
+    for index, entry in enumerate(entries):
         entry = entry.strip()
         if not entry:
             continue
 
-        # 預估加入這筆後是否超過最大長度
-        if len(current_chunk) + len(entry) + 2 > max_length:  # +2 為 \n\n
-            chunks.append(current_chunk.strip())
-            current_chunk = entry + "\n\n"
-        else:
-            current_chunk += entry + "\n\n"
+        units = utf16_len(entry)
+        pieces = split_oversized(entry, max_units) if units > max_units else [(entry, units)]
+        for piece, piece_units in pieces:
+            extra = piece_units + (separator_units if current else 0)
+            if current and current_units + extra > max_units:
+                chunks.append(separator.join(current))
+                owners.append(current_owners)
+                current, current_owners, current_units, extra = [], set(), 0, piece_units
+            current.append(piece)
+            current_owners.add(index)
+            current_units += extra
 
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    if current:
+        chunks.append(separator.join(current))
+        owners.append(current_owners)
+    return chunks, owners
 
-    return chunks
+def split_message_by_entry(message: str, max_length: int = LINE_MAX_MESSAGE_UNITS) -> list[str]:
+    """
+    將訊息依照「一筆一筆物件」進行分段，避免切到中間。
+    每筆以兩個換行 \n\n 分隔。
+    """
+    return build_chunks(message.split("\n\n"), max_units=max_length)
 
-def push_to_line(message: str):
+def push_to_line(message: str, recipient: str = None):
     """
     Send a message to LINE, but only if the item has not been pushed before.
     
     Args:
         message (str): The message to send
-        item_id (str): A unique identifier for the item being pushed
+        recipient (str): LINE user / group ID, defaults to the one set in .env
         
     Returns:
         bool: True if the message was sent successfully, False otherwise
@@ -56,35 +182,119 @@ def push_to_line(message: str):
     if not message or not isinstance(message, str):
         print("[LINE] Invalid message format")
         return False
-        
+
+    # 每筆資料間用兩個換行分隔
+    return push_entries(message.split("\n\n"), recipient)
+
+def push_entries(entries, recipient: str = None):
+    """
+    Send message blocks to LINE, packing them into as few messages as fit.
+
+    Args:
+        entries (list): Text blocks such as the header, one per listing and the footer
+        recipient (str): LINE user / group ID, defaults to the one set in .env
+
+    Returns:
+        bool: True if the message was sent successfully, False otherwise
+    """
+    return not deliver_entries(entries, recipient)
+
+def deliver_entries(entries, recipient: str = None):
+    """
+    push_entries(), reporting which entries did not make it.
+
+    Every batch is attempted even when an earlier one failed, so a failed
+    push loses as little as possible.
+
+    Returns:
+        set: Indexes into `entries` that were not delivered, empty on success
+    """
+    entries = list(entries)
     if not SEND_LINE_MESSAGE:
         print("[LINE] Debug mode, not sending message.")
-        return True
+        return set()
 
     # Check for required environment variables
-    if not LINE_TOKEN:
+    if not os.getenv(LINE_TOKEN_ENV):
         print("[LINE] Missing LINE_CHANNEL_ACCESS_TOKEN in .env")
-        return False
+        return set(range(len(entries)))
         
     # Determine recipient - prefer group if available, fallback to user
-    recipient = LINE_TO_GROUP or LINE_TO_USER
+    recipient = recipient or os.getenv(LINE_TO_GROUP_ENV) or os.getenv(LINE_TO_USER_ENV)
     if not recipient:
         print("[LINE] Missing both LINE_TO_GROUP_ID and LINE_TO_USER_ID in .env")
-        return False
+        return set(range(len(entries)))
 
-    headers = {
-        "Authorization": f"Bearer {LINE_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
-    MAX_LEN = 4000
-    chunks = chunks = split_message_by_entry(message, max_length=MAX_LEN) #[message[i:i + MAX_LEN] for i in range(0, len(message), MAX_LEN)]
+    chunks, owners = pack_chunks(entries)
+    if not chunks:
+        print("[LINE] Nothing to send")
+        return set()
 
     if len(chunks) > 1:
         print(f"[LINE] Message too long, splitting into {len(chunks)} parts")
     else:
         print("[LINE] Sending single message part")
 
+    undelivered = set()
+    size = max(1, LINE_MAX_MESSAGES_PER_PUSH)
+    for number, delivered in enumerate(send_batches(make_batches(chunks, size), recipient)):
+        if not delivered:
+            for chunk_owners in owners[number * size:(number + 1) * size]:
+                undelivered |= chunk_owners
+    return undelivered
+
+def send_batches(batches, recipient):
+    """
+    Push batches of message chunks, keeping the first and last batch in place.
+
+    The first batch (with the run header) goes out alone, the batches in
+    between are sent LINE_CONCURRENCY at a time, and the last batch (with the
+    run footer) waits for all of them, so only listings may arrive out of order.
+    A failed batch does not stop the others.
+
+    Returns:
+        list: Whether each batch was delivered, in order
+    """
+    if not batches:
+        return []
+
+    with metrics.timer("line_push"):
+        results = [send_batch(batches[0], recipient, 1, len(batches))]
+
+        middle = batches[1:-1]
+        if middle:
+            with ThreadPoolExecutor(max_workers=max(1, LINE_CONCURRENCY)) as executor:
+                results.extend(executor.map(
+                    lambda args: send_batch(args[1], recipient, args[0], len(batches)),
+                    enumerate(middle, start=2),
+                ))
+        if len(batches) > 1:
+            results.append(send_batch(batches[-1], recipient, len(batches), len(batches)))
+
+    sent = sum(results)
+    if sent == len(batches):
+        print("[LINE] Message sent successfully")
+    else:
+        print(f"[LINE] Only {sent}/{len(batches)} batches were delivered")
+    return results
+
+def send_batch(chunks, recipient, number, total):
+    """
+    Push one batch of at most LINE_MAX_MESSAGES_PER_PUSH chunks, retrying 429 and 5xx.
+
+    Every attempt carries the same X-Line-Retry-Key, so a retry of a push LINE
+    already accepted is answered with 409 instead of sending it twice.
+
+    Returns:
+        bool: True if the batch was delivered
+    """
+    import requests
+
+    headers = {
+        "Authorization": f"Bearer {os.getenv(LINE_TOKEN_ENV)}",
+        "Content-Type": "application/json",
+        "X-Line-Retry-Key": str(uuid.uuid4()),
+    }
     payload = {
         "to": recipient,
         "messages": [
@@ -96,24 +306,44 @@ def push_to_line(message: str):
         ]
     }
 
-    try:       
-        res = requests.post(LINE_API, headers=headers, json=payload, timeout=10)
-        if res.status_code == 200:
-            print("[LINE] Message sent successfully")
-            return True
-        else:
-            print(f"[LINE] Failed with status code {res.status_code}: {res.text}")
+    for attempt in range(LINE_MAX_RETRIES + 1):
+        delay = None
+        start = time.perf_counter()
+        try:
+            res = get_session().post(LINE_API, headers=headers, json=payload, timeout=LINE_TIMEOUT)
+            elapsed = time.perf_counter() - start
+            metrics.observe("line_batch", elapsed)
+
+            if res.status_code == 200 or (res.status_code == 409 and attempt > 0):
+                print(f"[LINE] Batch {number}/{total} sent in {elapsed * 1000:.0f}ms ({len(chunks)} messages)")
+                metrics.incr("line_messages_sent", len(chunks))
+                metrics.incr("line_batches_sent")
+                return True
+            if res.status_code not in RETRY_STATUS:
+                print(f"[LINE] Failed with status code {res.status_code}: {res.text}")
+                return False
+            print(f"[LINE] Batch {number}/{total} got status code {res.status_code} (Attempt {attempt + 1}/{LINE_MAX_RETRIES + 1})")
+            delay = retry_after_seconds(res.headers.get("Retry-After"))
+            if delay is not None and delay > MAX_RETRY_AFTER:
+                print(f"[LINE] Retry-After of {delay:.0f}s is over the {MAX_RETRY_AFTER}s limit, giving up on batch {number}/{total}")
+                metrics.incr("line_batch_failures")
+                return False
+        except requests.exceptions.Timeout:
+            print("[LINE] Request timed out")
+        except requests.exceptions.ConnectionError:
+            print("[LINE] Connection error - check network connectivity")
+        except requests.exceptions.RequestException as e:
+            print(f"[LINE] Request exception: {str(e)}")
             return False
-    except requests.exceptions.Timeout:
-        print("[LINE] Request timed out")
-        return False
-    except requests.exceptions.ConnectionError:
-        print("[LINE] Connection error - check network connectivity")
-        return False
-    except requests.exceptions.RequestException as e:
-        print(f"[LINE] Request exception: {str(e)}")
-        return False
-    except Exception as e:
-        print(f"[LINE] Unexpected exception: {str(e)}")
-        traceback.print_exc()
-        return False
+        except Exception as e:
+            print(f"[LINE] Unexpected exception: {str(e)}")
+            traceback.print_exc()
+            return False
+
+        if attempt < LINE_MAX_RETRIES:
+            metrics.incr("line_retries")
+            time.sleep(delay if delay is not None else backoff_delay(attempt))
+
+    print(f"[LINE] Batch {number}/{total} failed after {LINE_MAX_RETRIES + 1} attempts")
+    metrics.incr("line_batch_failures")
+    return False
@@ -0,0 +1,208 @@
+import threading
+import time
+import traceback
+
+from config import STREAM_BATCH_SIZE, STREAM_FLUSH_SECONDS
+from app.line_notify import deliver_entries
+from app.libs.utils import unpushed_ids, save_pushed_item
+from app.libs.listing import render_listing
+from app.libs.metrics import metrics
+
+
+def push_new_listings(items, scope, recipient=None, header=None, footer=None, limit=None, quiet=False, missed_searches=None):
+    """
+    Push the listings of `items` not yet pushed to `scope`, between an optional header and footer.
+
+    A listing is recorded as pushed only once the LINE batch carrying it was
+    delivered. One that failed stays unpushed and is sent again next run.
+
+    Args:
+        items (dict): ID -> Listing, in the order they should be pushed
+        scope (str): Seen-store scope, i.e. the profile name
+        recipient (str): LINE user / group ID, None for the default one
+        header (str): Block sent before the listings
+        footer (str): Block sent after the listings
+        limit (int): Only push the first `limit` new listings
+        quiet (bool): Send nothing when there is no new listing
+        missed_searches (set): Gets the source URLs of every new listing that
+            was not delivered or did not make the `limit`, see settle_page_cache()
+
+    Returns:
+        int: Number of new listings delivered
+    """
+    new_ids = unpushed_ids(items, scope)
+    ids = new_ids[:limit]
+    if not ids and quiet:
+        return 0
+
+    before = [header] if header else []
+    entries = before + [render_listing(items[item_id]) for item_id in ids] + ([footer] if footer else [])
+    undelivered = deliver_entries(entries, recipient)
+    delivered = [item_id for index, item_id in enumerate(ids, start=len(before)) if index not in undelivered]
+
+    if delivered:
+        save_pushed_item(delivered, scope)
+    if missed_searches is not None:
+        kept = set(delivered)
+        for item_id in new_ids:
+            if item_id not in kept:
+                missed_searches.update(items[item_id].source_urls)
+    metrics.incr("listings_new", len(delivered))
+    if len(delivered) < len(ids):
+        print(f"[LINE] {len(ids) - len(delivered)} listings for {scope} were not delivered, they will be retried next run")
+    return len(delivered)
+
+
+class MicroBatchNotifier:
+    """
+    Buffers one profile's listings and pushes them to LINE in small batches.
+
+    A batch is flushed once it holds `batch_size` listings or its oldest
+    listing has waited `flush_seconds`. The seen-ID check happens per batch
+    in push_new_listings(). Pushes run on a single background thread, so the
+    crawl never waits on LINE and messages keep their order. The header goes
+    with the first push and the footer with the last one. A `quiet` notifier
+    sends nothing at all when the run found no new listings. Searches with
+    a listing that could not be delivered are added to `missed_searches`.
+    """
+
+    def __init__(self, profile, header, footer, batch_size=STREAM_BATCH_SIZE, flush_seconds=STREAM_FLUSH_SECONDS, quiet=False, missed_searches=None):
+        self.profile = profile
+        self.missed_searches = missed_searches
+        self.header = header
+        self.footer = footer
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.quiet = quiet
+        self.buffer = {}
+        self.first_added = None
+        self.closed = False
+        self.header_sent = False
+        self.started = time.perf_counter()
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def add(self, listing):
+        with self.cond:
+            self.buffer[listing.id] = listing
+            if self.first_added is None:
+                self.first_added = time.monotonic()
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify()
+
+    def close(self):
+        """Flush what is left with the footer and wait for the last push"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+
+    def _wait_seconds(self):
+        """Seconds until the buffer is due, None while it is empty"""
+        if self.first_added is None:
+            return None
+        if len(self.buffer) >= self.batch_size:
+            return 0
+        return self.first_added + self.flush_seconds - time.monotonic()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.closed:
+                    wait = self._wait_seconds()
+                    if wait is not None and wait <= 0:
+                        break
+                    self.cond.wait(timeout=wait)
+                batch, self.buffer, self.first_added = self.buffer, {}, None
+                final = self.closed
+
+            try:
+                self._flush(batch, final)
+            except Exception as e:
+                print(f"[Stream] Failed to notify profile {self.profile.name}: {str(e)}")
+                traceback.print_exc()
+                if self.missed_searches is not None:
+                    self.missed_searches.update(url for listing in batch.values() for url in listing.source_urls)
+            if final:
+                return
+
+    def _flush(self, batch, final):
+        if batch:
+            batch = {listing.id: listing for listing in self.profile.rank(batch.values())}
+        new = unpushed_ids(batch, scope=self.profile.name) if batch else []
+        if not new and (not final or (self.quiet and not self.header_sent)):
+            return
+
+        if new and not self.header_sent:
+            metrics.observe("time_to_first_notification", time.perf_counter() - self.started)
+        header = None if self.header_sent else self.header
+        self.header_sent = True
+        metrics.incr("stream_flushes")
+        push_new_listings(
+            {item_id: batch[item_id] for item_id in new}, self.profile.name, recipient=self.profile.line_to,
+            header=header, footer=self.footer if final else None, missed_searches=self.missed_searches,
+        )
+
+
+def stream_to_line(listings, profiles, build_header, footer, quiet=False, missed_searches=None):
+    """
+    Notify every profile while the crawl is still running.
+
+    Args:
+        listings (iterable): Listings in discovery order, e.g. iter_crawler()
+        profiles (list): Profiles to notify
+        build_header (callable): build_header(profile) -> first line block of its message
+        footer (str): Text sent with each profile's last push
+        quiet (bool): Skip profiles that got no new listings instead of sending an empty message
+        missed_searches (set): Gets the searches with undelivered listings, see push_new_listings()
+
+    Returns:
+        bool: False if the crawl failed part way
+    """
+    notifiers = [
+        MicroBatchNotifier(profile, build_header(profile), footer, quiet=quiet, missed_searches=missed_searches).start()
+        for profile in profiles
+    ]
+    # IDs handed to each notifier. A listing can come back from several merged
+    # queries serving different profiles, so every copy is routed, but each
+    # profile gets a listing once. Only IDs are kept, not the listings.
+    notified = [set() for _ in notifiers]
+    try:
+        for listing in listings:
+            for notifier, sent in zip(notifiers, notified):
+                if listing.id not in sent and notifier.profile.matches(listing):
+                    sent.add(listing.id)
+                    notifier.add(listing)
+    except Exception as e:
+        print(f"[Critical Error] Crawler failed: {str(e)}")
+        traceback.print_exc()
+        return False
+    finally:
+        for notifier in notifiers:
+            notifier.close()
+    return True
+
+
+def settle_page_cache(cache, crawled, missed_searches):
+    """
+    Commit the run's page-1 fingerprints once its pushes are done, and save the cache.
+
+    A search whose first page is unchanged is skipped next run, so a
+    fingerprint only counts once every listing it led to was delivered.
+    After a failed crawl nothing is written at all.
+
+    Args:
+        cache (PageCache): The run's page cache, None when INCREMENTAL_CRAWL is off
+        crawled (bool): Whether the crawl finished
+        missed_searches (set): Searches with undelivered listings, they are crawled in full next run
+    """
+    if not cache or not crawled:
+        return
+    cache.commit(exclude=missed_searches)
+    if missed_searches:
+        print(f"[PageCache] {len(missed_searches)} searches have undelivered listings, they are crawled in full next run")
+    cache.save()
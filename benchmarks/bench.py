@@ -0,0 +1,422 @@
+"""
+Offline crawler benchmarks against recorded 591 list pages.
+
+    python -m benchmarks.bench                         # http backend, configured parser
+    python -m benchmarks.bench --backend selenium --parser lxml
+    python -m benchmarks.bench --matrix --output bench.json
+    python -m benchmarks.bench --matrix --baseline bench.json
+    python -m benchmarks.bench --messages              # LINE message builder scaling
+    python -m benchmarks.bench --ranking               # listing filter / rank stage scaling
+
+Every run serves benchmarks/fixtures from a local HTTP server, so no
+network access is needed. Each backend/parser combination runs in its own
+process in --matrix mode so that peak RSS figures are not shared.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+BACKENDS = ["http", "selenium"]
+PARSERS = ["html.parser", "lxml", "selectolax"]
+
+# Throughput figures compared against a baseline
+THROUGHPUT_KEYS = ["pages_per_second", "listings_per_second", "ops_per_second"]
+
+# Listings per run for the message builder benchmark
+MESSAGE_SIZES = [1250, 2500, 5000, 10000]
+
+# Listings per run for the filter / rank benchmark, up to every district and page
+RANKING_SIZES = [1000, 10000, 100000]
+
+
+def configure(backend, parser):
+    """Point config at the benchmark setup before any app module imports it"""
+    import config
+    config.FETCH_BACKEND = backend
+    config.PARSER_ENGINE = parser
+    config.REQUESTS_PER_SECOND = 0      # No pacing against the local server
+    config.REQUEST_JITTER_SECONDS = 0
+    config.INCREMENTAL_CRAWL = False    # Every run must do the full work
+    config.STOP_WHEN_ALL_SEEN = False
+    config.SEND_LINE_MESSAGE = False
+    config.RUN_REPORT_FILE = None
+    config.PROMETHEUS_TEXTFILE = None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))] * 1000, 3)
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+def measure(func, rounds):
+    """Call func() `rounds` times and return latency / throughput stats"""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    result = {"rounds": rounds, "ops_per_second": round(rounds / total, 2) if total else None}
+    result.update(percentiles(samples))
+    return result
+
+
+def micro_benchmarks(rounds):
+    from benchmarks.server import load_fixture, LIST_PAGE
+    from app.crawler import get_recommends, get_normal_items
+    from app.libs.parsing import parse_html
+    from app.libs.utils import concat_items
+    from app.line_notify import split_message_by_entry
+
+    html = load_fixture(LIST_PAGE)
+    doc = parse_html(html)
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = {**(get_recommends(doc) or {}), **(get_normal_items(doc) or {})}
+
+    # concat_items records what it returns, so every round gets unseen IDs
+    counter = iter(range(10 ** 9))
+
+    def concat_round():
+        offset = next(counter) * 1000
+        fresh = {}
+        for listing in items.values():
+            listing_copy = copy.copy(listing)
+            listing_copy.id = listing.id + 10 ** 8 + offset
+            fresh[listing_copy.id] = listing_copy
+        concat_items(fresh)
+
+    # A busy run's worth of text for the chunker
+    with contextlib.redirect_stdout(io.StringIO()):
+        message = concat_items(dict(items)) * 50
+
+    results = {
+        "parse_html": measure(lambda: parse_html(html), rounds),
+        "get_recommends": measure(lambda: get_recommends(doc), rounds),
+        "get_normal_items": measure(lambda: get_normal_items(doc), rounds),
+        "concat_items": measure(concat_round, rounds),
+        "split_message_by_entry": measure(lambda: split_message_by_entry(message), rounds),
+    }
+    results["parse_html"]["listings_per_page"] = len(items)
+    return results
+
+
+def message_benchmark(sizes=MESSAGE_SIZES, rounds=10):
+    """
+    Time build_chunks() on synthetic runs of up to 10k listings.
+
+    The time per listing should stay flat as the input grows, since the
+    builder is linear. Titles mix CJK text with an emoji so UTF-16 counting matters.
+    """
+    from app.libs.listing import Listing, render_listing
+    from app.line_notify import build_chunks
+
+    results = {}
+    for size in sizes:
+        entries = [
+            render_listing(Listing(
+                10 ** 8 + i, f"捷運站旁全新裝潢電梯套房 🏠 {i}", f"https://rent.591.com.tw/{10 ** 8 + i}",
+                price=15000 + i % 5000, ping=8 + i % 12,
+            ))
+            for i in range(size)
+        ]
+        result = measure(lambda: build_chunks(entries), rounds)
+        result["listings"] = size
+        result["chunks"] = len(build_chunks(entries))
+        result["us_per_listing"] = round(result["p50_ms"] * 1000 / size, 3)
+        results[str(size)] = result
+    return results
+
+
+def print_message_table(results):
+    header = f"{'listings':>9} {'chunks':>7} {'p50':>10} {'per listing':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results.values():
+        print(f"{r['listings']:>9} {r['chunks']:>7} {r['p50_ms']:>8}ms {r['us_per_listing']:>10}us")
+
+
+def ranking_benchmark(sizes=RANKING_SIZES, rounds=10):
+    """
+    Time rank_listings() with every filter kind, a score and a top 20.
+
+    Synthetic listings leave about a tenth of each field missing, as list
+    pages sometimes do.
+    """
+    import random
+    from app.libs.listing import Listing
+    from app.libs.ranking import rank_listings
+
+    filters = {"max_price_per_ping": 1500, "min_ping": 6, "max_age_minutes": 720, "exclude_top_floor": True, "exclude_basement": True}
+    score = "-price_per_ping - age_minutes / 30"
+
+    def maybe(value):
+        return None if rng.random() < 0.1 else value
+
+    rng = random.Random(591)
+    results = {}
+    for size in sizes:
+        listings = []
+        for i in range(size):
+            top_floor = rng.randint(2, 20)
+            listings.append(Listing(
+                i, "t", "l", price=maybe(rng.randint(5000, 40000)), ping=maybe(round(rng.uniform(3, 40), 1)),
+                age_minutes=maybe(rng.randint(1, 1440)), floor=maybe(rng.choice([-1, 1, top_floor // 2 or 1, top_floor])),
+                top_floor=top_floor,
+            ))
+        result = measure(lambda: rank_listings(listings, filters, score, top_n=20), rounds)
+        result["listings"] = size
+        results[str(size)] = result
+    return results
+
+
+def print_ranking_table(results):
+    header = f"{'listings':>9} {'p50':>10} {'p95':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results.values():
+        print(f"{r['listings']:>9} {r['p50_ms']:>8}ms {r['p95_ms']:>8}ms")
+
+
+def fetch_benchmark(server, rounds):
+    from app.libs.utils import get_fetcher, get_page_content
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        fetcher = get_fetcher()
+    if not fetcher:
+        return {"error": "fetch backend unavailable"}
+
+    url = server.base_url + "/list?region=1&kind=1"
+    try:
+        result = measure(lambda: get_page_content(fetcher, url), rounds)
+        result["pages_per_second"] = result.pop("ops_per_second")
+        return result
+    finally:
+        fetcher.quit()
+
+
+def end_to_end_benchmark(server):
+    import app.crawler as crawler
+    from app.libs.metrics import metrics
+
+    real_generate_urls = crawler.generate_urls
+
+    def local_urls():
+        return [url.replace("https://rent.591.com.tw", server.base_url) for url in real_generate_urls()]
+
+    crawler.generate_urls = local_urls
+    metrics.reset()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            items = crawler.run_crawler()
+    finally:
+        crawler.generate_urls = real_generate_urls
+    elapsed = time.perf_counter() - start
+
+    report = metrics.snapshot()
+    pages = report["counters"].get("pages_fetched", 0)
+    listings = report["counters"].get("listings_parsed", 0)
+    fetch = report["timings"].get("page_fetch", {})
+    return {
+        "seconds": round(elapsed, 3),
+        "urls": len(local_urls()),
+        "pages": pages,
+        "listings": listings,
+        "unique_listings": len(items or {}),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+        "listings_per_second": round(listings / elapsed, 2) if elapsed else None,
+        "fetch_p50_ms": round(fetch.get("p50", 0) * 1000, 3),
+        "fetch_p95_ms": round(fetch.get("p95", 0) * 1000, 3),
+        "fetch_p99_ms": round(fetch.get("p99", 0) * 1000, 3),
+    }
+
+
+def run_single(backend, parser, rounds, pages, latency):
+    configure(backend, parser)
+    from benchmarks.server import FixtureServer
+    from app.libs.parsing import resolve_engine
+
+    result = {"backend": backend, "parser": parser}
+    with contextlib.redirect_stdout(io.StringIO()):
+        effective = resolve_engine(parser)
+    if effective != parser:
+        result["error"] = f"{parser} is not installed"
+        return result
+
+    # State files (seen store, page cache) go to a throwaway directory
+    with tempfile.TemporaryDirectory() as workdir, FixtureServer(pages=pages, latency=latency) as server:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            result["micro"] = micro_benchmarks(rounds)
+            result["fetch"] = fetch_benchmark(server, rounds)
+            if "error" in result["fetch"]:
+                result["error"] = result["fetch"]["error"]
+            else:
+                result["end_to_end"] = end_to_end_benchmark(server)
+        finally:
+            os.chdir(cwd)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_matrix(args):
+    results = []
+    for backend in BACKENDS:
+        for parser in PARSERS:
+            cmd = [
+                sys.executable, "-m", "benchmarks.bench",
+                "--backend", backend, "--parser", parser,
+                "--rounds", str(args.rounds), "--pages", str(args.pages),
+                "--latency", str(args.latency), "--json",
+            ]
+            proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+            try:
+                results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (IndexError, ValueError):
+                results.append({"backend": backend, "parser": parser, "error": proc.stderr.strip()[-300:] or "no output"})
+    return results
+
+
+def print_table(results):
+    header = f"{'backend':<9} {'parser':<12} {'e2e pages/s':>11} {'listings/s':>10} {'fetch p95':>10} {'parse ops/s':>11} {'peak RSS':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<9} {r['parser']:<12} skipped: {r['error'].splitlines()[-1] if r['error'] else ''}")
+            continue
+        e2e = r["end_to_end"]
+        print(
+            f"{r['backend']:<9} {r['parser']:<12} {e2e['pages_per_second']:>11} {e2e['listings_per_second']:>10} "
+            f"{e2e['fetch_p95_ms']:>8}ms {r['micro']['parse_html']['ops_per_second']:>11} {r['peak_rss_mb']:>7}MB"
+        )
+
+
+def _throughputs(result, prefix=""):
+    """Flatten every throughput figure of a result into {path: value}"""
+    flat = {}
+    for key, value in result.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_throughputs(value, path + "."))
+        elif key in THROUGHPUT_KEYS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(results, baseline_path, max_regression):
+    """
+    Compare throughput against a saved run.
+
+    Returns:
+        bool: False if any figure dropped by more than max_regression
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["backend"], r["parser"]): r for r in json.load(f)}
+
+    ok = True
+    for r in results:
+        base = baseline.get((r["backend"], r["parser"]))
+        if not base or "error" in r or "error" in base:
+            continue
+        before, after = _throughputs(base), _throughputs(r)
+        for path, old in before.items():
+            new = after.get(path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change < -max_regression:
+                ok = False
+                print(f"[Bench] Regression {r['backend']}/{r['parser']} {path}: {old} -> {new} ({change:+.0%})")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline 591 crawler benchmarks")
+    parser.add_argument("--backend", choices=BACKENDS, default="http")
+    parser.add_argument("--parser", choices=PARSERS, default=None, help="Defaults to PARSER_ENGINE in config.py")
+    parser.add_argument("--matrix", action="store_true", help="Run every backend/parser combination")
+    parser.add_argument("--rounds", type=int, default=50, help="Iterations per micro / fetch benchmark")
+    parser.add_argument("--pages", type=int, default=3, help="Pages with results per search before .empty")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial server latency in seconds")
+    parser.add_argument("--json", action="store_true", help="Print a single JSON line only")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare throughput against a previous --output file")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed throughput drop vs baseline")
+    parser.add_argument("--messages", action="store_true", help="Only run the LINE message builder benchmark")
+    parser.add_argument("--ranking", action="store_true", help="Only run the listing filter / rank benchmark")
+    args = parser.parse_args(argv)
+
+    if args.ranking:
+        configure(args.backend, args.parser or "html.parser")
+        results = ranking_benchmark(rounds=min(args.rounds, 10))
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False))
+        else:
+            print_ranking_table(results)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return 0
+
+    if args.messages:
+        configure(args.backend, args.parser or "html.parser")
+        results = message_benchmark(rounds=min(args.rounds, 10))
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False))
+        else:
+            print_message_table(results)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return 0
+
+    if args.matrix:
+        results = run_matrix(args)
+    else:
+        import config
+        results = [run_single(args.backend, args.parser or config.PARSER_ENGINE, args.rounds, args.pages, args.latency)]
+
+    if args.json:
+        print(json.dumps(results[0] if len(results) == 1 else results, ensure_ascii=False))
+    else:
+        print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import gzip
+import os
+import re
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+LIST_PAGE = "list_page.html"
+EMPTY_PAGE = "list_page_empty.html"
+
+_LISTING_LINK = re.compile(r"(rent\.591\.com\.tw/)(\d+)")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class FixtureServer:
+    """
+    Local stand-in for rent.591.com.tw serving the recorded list pages.
+
+    Pages 1..`pages` of every search return the with-results fixture, later
+    pages return the `.empty` fixture. Listing IDs are shifted per (search,
+    page) so different pages do not collapse into the same listings.
+    """
+
+    def __init__(self, pages=3, latency=0.0):
+        self.pages = pages
+        self.latency = latency
+        self.list_page = load_fixture(LIST_PAGE)
+        self.empty_page = load_fixture(EMPTY_PAGE).encode("utf-8")
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.httpd = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def render(self, path):
+        parts = urlsplit(path)
+        query = parse_qs(parts.query)
+        page = int(query.get("page", ["1"])[0])
+        if page > self.pages:
+            return self.empty_page
+
+        search = re.sub(r"&page=\d+", "", path)
+        offset = (zlib.crc32(search.encode("utf-8")) % 10000) * 1000 + page * 100
+        html = _LISTING_LINK.sub(lambda m: m.group(1) + str(int(m.group(2)) + offset), self.list_page)
+        return html.encode("utf-8")
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                body = server.render(self.path)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=5)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -15,9 +15,113 @@ MIN_PING = 10                  # 最小坪數
 MAX_PING = 20                 # 最大坪數
 KINDS = ["1", "2"]            # 1: 整層住家, 2: 獨立套房, 3: 分租套房
 NEW_WITHIN_HOURS = 18       # 幾小時內上架的物件
+MAX_PAGES = 5               # 每個搜尋最多爬幾頁
+PAGINATION_CUTOFF_HOURS = NEW_WITHIN_HOURS  # 頁面上最舊的物件超過幾小時就不再翻頁
+STOP_WHEN_ALL_SEEN = True   # 整頁物件都推播過時就不再翻頁
+
+FETCH_BACKEND = "selenium"  # "selenium" or "http"（不開瀏覽器，直接用 requests 抓）
+HTTP_POOL_SIZE = 10         # http 模式下的連線池大小
+HTTP_TIMEOUT = 15           # http 模式下單次請求的逾時秒數
+
+REQUESTS_PER_SECOND = 0.25  # 對同一個網站每秒最多送出的請求數（所有 worker 共用；原本每頁固定等 2 秒約為 0.3）
+                            # 預設值下抓取速度由這裡決定，多開 worker 幾乎沒有幫助；要讓 CRAWLER_WORKERS / ASYNC_CONCURRENCY 發揮效果需一併調高
+RATE_BURST = 1              # 允許短時間內連續送出的請求數
+REQUEST_JITTER_SECONDS = 1.5  # 每個請求前額外隨機等待 0~N 秒
+BACKOFF_BASE = 1.0          # 失敗重試的起始等待秒數（指數成長並加上隨機抖動）
+BACKOFF_MAX = 30            # 失敗重試的最長等待秒數
+PAGE_READY_TIMEOUT = 10     # 等待列表元素出現的最長秒數
+
+PARSER_ENGINE = "html.parser"  # "html.parser"、"lxml" 或 "selectolax"（後兩者需安裝 fast 選用套件：uv sync --extra fast）
+RESTRICTED_PARSE = True     # 只解析物件列表區塊，略過頁面其他部分
+
+KEEP_WARM_SESSIONS = True   # main.py 排程之間保留瀏覽器，不必每次重新啟動 Chrome
+SESSION_MAX_PAGES = 300     # 單一瀏覽器抓過幾頁後重新啟動
+SESSION_MAX_RSS_MB = 1024   # 瀏覽器記憶體超過多少 MB 後重新啟動
+
+BLOCK_RESOURCES = True      # selenium 模式下不載入圖片、字型、CSS 與追蹤程式
+BLOCKED_URL_PATTERNS = [    # 封鎖的網址（CDP 萬用字元）
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4",
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*",
+    "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*clarity.ms*",
+]
+ALLOWED_URL_PATTERNS = []   # 從封鎖清單中排除的網址（例如 "*.css"）
+REPORT_PAGE_BYTES = True    # 記錄每頁實際傳輸量與被封鎖的請求數（不會為了估算而多載入頁面）
+
+CRAWL_ENGINE = "pool"       # "pool"（多個瀏覽器輪流抓）、"async"（asyncio 同時抓多頁）或 "distributed"（透過工作佇列分給多台機器）
+ASYNC_CONCURRENCY = 4       # async 模式下同時進行的請求上限
+SPECULATIVE_PAGES = 3       # async 模式下每個搜尋預先抓取的頁數
+
+PARSE_PROCESSES = 0         # 解析頁面用的行程數（0 表示在抓取的執行緒裡直接解析）
+PARSE_QUEUE_SIZE = 8        # 等待解析的頁面上限
+
+LOW_MEMORY = False          # 低記憶體模式：解析完立即釋放頁面、限制同時保留的頁面數，並在每次執行後歸還記憶體
+MAX_INFLIGHT_PAGES = 2      # 低記憶體模式下同時抓取／解析中的頁面上限
+MEMORY_SAMPLE_SECONDS = 0.5  # 每次執行中取樣記憶體用量的間隔（回報峰值）
+
+CRAWLER_WORKERS = 3         # 同時運作的 Chrome 數量（仍受 REQUESTS_PER_SECOND 限制，見上方說明）
+TASK_QUEUE_SIZE = 10        # 等待中的 (url, page) 任務上限
+TASK_MAX_RETRIES = 2        # 單一頁面失敗後的重試次數（每次換新的瀏覽器，抓取本身只試一次）
+
+JOB_QUEUE_BACKEND = "sqlite"  # distributed 模式的工作佇列："sqlite" 或 "redis"（需安裝 redis 並在 .env 設定 REDIS_URL）
+JOB_QUEUE_FILE = "crawl_jobs.db"  # sqlite 工作佇列檔案（多個 worker 需共用同一個檔案）
+JOB_LEASE_SECONDS = 120     # worker 領取工作後多久沒完成就交給別的 worker
+JOB_MAX_ATTEMPTS = 3        # 單一頁面最多被領取幾次
+JOB_POLL_SECONDS = 2        # 佇列空的時候多久檢查一次
+DISTRIBUTED_LOCAL_WORKERS = 1  # 主程式本身也一起抓的 worker 數
+DISTRIBUTED_TIMEOUT = 1800  # 主程式最多等待所有工作完成的秒數
+
+SEEN_STORE_FILE = "seen_items.db"  # 已推播物件 ID 的 SQLite 檔（首次執行會匯入 pushed_items.json）
+SEEN_TTL_DAYS = 30          # 已推播 ID 保留天數，None 表示永久保留
+
+# 物件歷史紀錄（價格變動、重新刊登偵測）
+LISTING_HISTORY = True  # 將每次爬到的物件寫入歷史資料庫
+LISTING_HISTORY_FILE = "listing_history.db"  # 物件歷史 SQLite 檔
+HISTORY_BATCH_SIZE = 500  # 每筆交易寫入的物件數
+
+INCREMENTAL_CRAWL = True    # 第一頁與上次相同時略過該搜尋（HTTP 模式另外使用 ETag / Last-Modified）
+PAGE_CACHE_FILE = "page_cache.json"  # 保存每個搜尋第一頁狀態的檔案
+PAGE_CACHE_MAX_ENTRIES = 500  # 最多保存幾個搜尋網址（超過時淘汰最久沒用到的）
+
+RUN_REPORT_FILE = "run_report.json"  # 每次執行的耗時與計數報告（JSON）
+PROMETHEUS_TEXTFILE = None  # 另外輸出 Prometheus textfile 的路徑，None 表示不輸出
+
+LINE_MAX_MESSAGE_UNITS = 5000  # LINE 單則文字訊息長度上限（以 UTF-16 字元單位計算）
+LINE_MAX_MESSAGES_PER_PUSH = 5  # LINE 每次 push 最多 5 則訊息
+LINE_CONCURRENCY = 3        # 同時送出的 push 請求數
+LINE_MAX_RETRIES = 3        # 遇到 429 / 5xx 時的重試次數（會依照 Retry-After 等待，超過 LINE_TIMEOUT 的 4 倍則視為失敗）
+LINE_TIMEOUT = 10           # 單次 push 的逾時秒數
+
+STREAM_NOTIFICATIONS = False  # 邊爬邊推播，不等全部搜尋都爬完（推播次數較多、較耗 LINE 額度，且 LISTING_TOP_N 不適用）
+STREAM_BATCH_SIZE = 10      # 累積幾筆新物件就先推播
+STREAM_FLUSH_SECONDS = 30   # 最早一筆物件等待超過幾秒就先推播
+
+# 抓回來之後再套用的篩選與排序（網址參數做不到的條件），每個 profile 可另外指定 filters / score / top_n
+# 可用條件: min_price, max_price, min_ping, max_ping, max_age_minutes, max_price_per_ping, exclude_top_floor, exclude_basement
+LISTING_FILTERS = {}        # 例如 {"max_price_per_ping": 1200, "exclude_top_floor": True}
+LISTING_SCORE = None        # 排序分數（越高越前面），可用 price, ping, age_minutes, floor, top_floor, price_per_ping，例如 "-price_per_ping - age_minutes / 30"
+LISTING_TOP_N = None        # 每次執行每個 profile 最多推播幾筆新物件，None 表示不限（需等全部爬完才能取前 N 筆，STREAM_NOTIFICATIONS 時不適用）
+
+PROFILES = []               # 多人訂閱：每個 dict 為一組搜尋條件與 LINE 收件者，空的表示只用上面的單一搜尋
+# 沒寫到的欄位沿用上面的設定，同一頁只會抓一次，再依各自條件篩選
+# PROFILES = [
+#     {"name": "alice", "search_mode": "metro", "areas": {"148": ["4248"]}, "rent_range": (10000, 18000),
+#      "min_ping": 8, "max_ping": 15, "kinds": ["2"], "new_within_hours": 12, "line_to_env": "LINE_TO_USER_ID_ALICE"},
+#     {"name": "bob", "areas": {"148": ["4248", "4250"]}, "line_to_env": "LINE_TO_USER_ID_BOB",
+#      "filters": {"max_price_per_ping": 1500, "exclude_top_floor": True}, "score": "-price", "top_n": 10},
+# ]
 
 SEND_LINE_MESSAGE = True
-RANDOM_DELAY = True
+
+# main.py 自適應排程：依各搜尋過去的新物件出現速度決定多久爬一次
+ADAPTIVE_SCHEDULE = True    # False 則使用固定時段排程
+SCHEDULE_TICK_MINUTES = 5   # 每隔幾分鐘檢查哪些搜尋該爬了
+MIN_POLL_MINUTES = 15       # 同一個搜尋最短間隔
+MAX_POLL_HOURS = 6          # 同一個搜尋最長間隔（冷門時段也至少這麼久爬一次）
+DAILY_REQUEST_BUDGET = None  # 每日頁面請求上限，None 表示與固定 8 個時段相同的量
+ARRIVAL_PRIOR_PER_HOUR = 1.0  # 尚無資料時假設每小時的新物件數
+ARRIVAL_SMOOTHING = 0.3     # 新觀測值的權重（指數移動平均）
+POLL_SCHEDULE_FILE = "poll_schedule.json"  # 學到的各搜尋新物件速度
 
 GET_RECOMMENDS = True
 GET_NORMAL = True
@@ -1,15 +1,22 @@
-import random
 import time
 from apscheduler.schedulers.blocking import BlockingScheduler
-from dotenv import load_dotenv
-from app.crawler import run_crawler
-from app.line_notify import push_to_line
-from app.libs.utils import concat_items
+from app.libs.env import load_env
+from app.crawler import generate_urls
+from app.engines import load_engine
+from app.pipeline import stream_to_line, push_new_listings, settle_page_cache
+from app.libs.metrics import metrics
+from app.libs.profiles import load_profiles, DEFAULT_SCOPE
+from app.libs.listing_history import record_history, save_history
+from app.libs.memory import PeakMemory
+from app.libs.page_cache import PageCache
+from app.libs.poll_schedule import PollSchedule
+from app.libs.session_manager import SessionManager
+from app.libs.utils import get_fetcher
 from datetime import datetime
 
-from config import RENT_RANGE, MIN_PING, MAX_PING, NEW_WITHIN_HOURS, RANDOM_DELAY, TEST_MODE, KINDS, SEARCH_MODE
+from config import STREAM_NOTIFICATIONS, TEST_MODE, CRAWL_ENGINE, KEEP_WARM_SESSIONS, LISTING_HISTORY, ADAPTIVE_SCHEDULE, SCHEDULE_TICK_MINUTES, LOW_MEMORY, INCREMENTAL_CRAWL
 
-load_dotenv()
+load_env()
 
 KINDS_TABLE = {
     "1": "整層住家",
@@ -27,33 +34,95 @@ SEARCH_MODE_TABLE = {
 
 scheduler = BlockingScheduler(timezone='Asia/Taipei')
 
-def log_and_run():
-    delay = random.randint(0, 1000)  # random delay between 0 and 1000 seconds
-    print(f"[Scheduler] Waiting for {delay} seconds to simulate human behavior...")
+# Browsers stay up between scheduled jobs so Chrome starts once per process
+sessions = SessionManager(get_fetcher) if KEEP_WARM_SESSIONS else None
 
-    if RANDOM_DELAY:
-        time.sleep(delay)
+# Learned per-search arrival rates, None on the fixed schedule
+schedule = PollSchedule() if ADAPTIVE_SCHEDULE else None
 
-    start_message = f"""現在時間: {datetime.now().strftime("%Y-%m-%d %H:%M")}\n搜尋模式: {SEARCH_MODE_TABLE[SEARCH_MODE]}\n租金區間: {RENT_RANGE[0]}~{RENT_RANGE[1]}元\n坪數: {MIN_PING}~{MAX_PING}坪\n租屋類型:{'、'.join(KINDS_TABLE[k] for k in KINDS)}\n更新物件: {NEW_WITHIN_HOURS}小時內\n開始爬蟲...\n-----------------------"""
+def build_start_message(profile):
+    subscriber = f"訂閱: {profile.name}\n" if profile.name != DEFAULT_SCOPE else ""
+    return f"""{subscriber}現在時間: {datetime.now().strftime("%Y-%m-%d %H:%M")}\n搜尋模式: {SEARCH_MODE_TABLE[profile.search_mode]}\n租金區間: {profile.rent_range[0]}~{profile.rent_range[1]}元\n坪數: {profile.min_ping}~{profile.max_ping}坪\n租屋類型:{'、'.join(KINDS_TABLE[k] for k in profile.kinds)}\n更新物件: {profile.new_within_hours}小時內\n開始爬蟲...\n-----------------------"""
+
+def log_and_run(urls=None):
+    """
+    Crawl and notify every profile.
+
+    Args:
+        urls (list): Searches picked by the adaptive schedule, which then learns
+            from the results and skips profiles with nothing new. None crawls
+            every search.
+    """
     end_message = "-----------------------\n爬蟲結束，請查看租屋資訊！"
 
-    items = run_crawler()
-    message = concat_items(items)
-    push_to_line(start_message + "\n" + message + "\n" + end_message)
+    metrics.reset()
+    profiles = load_profiles()
+    run_engine, stream_engine = load_engine(CRAWL_ENGINE)
+    # First-page fingerprints are only kept for searches whose listings all got delivered
+    cache = PageCache() if INCREMENTAL_CRAWL else None
+    missed_searches = set()
+    with PeakMemory(release=LOW_MEMORY):
+        if STREAM_NOTIFICATIONS:
+            # Push new listings in small batches while later pages are still being crawled
+            listings = stream_engine(sessions, urls, cache)
+            if LISTING_HISTORY:
+                listings = record_history(listings)
+            if urls is not None:
+                listings = schedule.watch(urls, listings)
+            crawled = stream_to_line(listings, profiles, build_start_message, end_message, quiet=urls is not None, missed_searches=missed_searches)
+        else:
+            polled_at = time.time()
+            items = run_engine(sessions, urls, cache)
+            crawled = items is not None
+            if LISTING_HISTORY:
+                save_history(items)
+            if urls is not None and items is not None:
+                schedule.record(urls, items.values(), polled_at)
+
+            # Every page was fetched once, each profile picks its own listings out of it
+            for profile in profiles:
+                push_new_listings(
+                    profile.select(items), profile.name, recipient=profile.line_to,
+                    header=build_start_message(profile), footer=end_message, limit=profile.top_n, quiet=urls is not None,
+                    missed_searches=missed_searches,
+                )
+    settle_page_cache(cache, crawled, missed_searches)
 
+    metrics.write_report()
     print("[Scheduler] Crawler finished.")
 
-# Run at specific hours
-# 7, 10, 12, 15, 18, 20, 22, 24
-@scheduler.scheduled_job('cron', hour='0, 7, 10, 12, 15, 18, 20, 22', minute=0, misfire_grace_time=900)
-def scheduled_job():
-    log_and_run()
+def poll_due_searches():
+    """Crawl only the searches the adaptive schedule says are due"""
+    urls = generate_urls()
+    due = schedule.due(urls)
+    if not due:
+        return
+    print(f"[Scheduler] {len(due)} of {len(urls)} searches due, {schedule.spent} page loads spent today")
+    log_and_run(due)
+
+if ADAPTIVE_SCHEDULE:
+    # Short ticks; each search is crawled when its own learned interval has passed
+    @scheduler.scheduled_job('interval', minutes=SCHEDULE_TICK_MINUTES, max_instances=1, coalesce=True)
+    def scheduled_job():
+        poll_due_searches()
+else:
+    # Run at specific hours
+    # 7, 10, 12, 15, 18, 20, 22, 24
+    @scheduler.scheduled_job('cron', hour='0, 7, 10, 12, 15, 18, 20, 22', minute=0, misfire_grace_time=900)
+    def scheduled_job():
+        log_and_run()
 
 if __name__ == '__main__':
     print("[Scheduler] Starting...")
 
     if TEST_MODE:
         print("[Test Mode] Running crawler immediately...")
-        log_and_run()
+        scheduled_job()
 
-    scheduler.start()
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        print("[Scheduler] Stopping...")
+    finally:
+        if sessions:
+            sessions.close()
@@ -1,13 +1,24 @@
-from dotenv import load_dotenv
-from app.crawler import run_crawler
-from app.line_notify import push_to_line
-from app.libs.utils import concat_items
+import time
+
+# Before any other import, so --dry-run can report how long startup took
+STARTED = time.perf_counter()
+
+import argparse
+import sys
 from datetime import datetime
+from importlib import import_module
 from zoneinfo import ZoneInfo
 
-from config import RENT_RANGE, MIN_PING, MAX_PING, NEW_WITHIN_HOURS, KINDS, SEARCH_MODE
+from app.libs.env import load_env
+from app.engines import load_engine
+from app.pipeline import stream_to_line, push_new_listings, settle_page_cache
+from app.libs.metrics import metrics
+from app.libs.profiles import load_profiles, DEFAULT_SCOPE
+from app.libs.listing_history import record_history, save_history
+from app.libs.memory import PeakMemory
+from app.libs.page_cache import PageCache
 
-load_dotenv()
+from config import STREAM_NOTIFICATIONS, CRAWL_ENGINE, LISTING_HISTORY, LOW_MEMORY, FETCH_BACKEND, PARSER_ENGINE, SEND_LINE_MESSAGE, INCREMENTAL_CRAWL
 
 KINDS_TABLE = {
     "1": "整層住家",
@@ -23,15 +34,93 @@ SEARCH_MODE_TABLE = {
     "metro": "捷運站"
 }
 
+def build_start_message(profile):
+    subscriber = f"訂閱: {profile.name}\n" if profile.name != DEFAULT_SCOPE else ""
+    return f"""{subscriber}現在時間: {datetime.now(ZoneInfo("Asia/Taipei")).strftime("%Y-%m-%d %H:%M")}\n搜尋模式: {SEARCH_MODE_TABLE[profile.search_mode]}\n租金區間: {profile.rent_range[0]}~{profile.rent_range[1]}元\n坪數: {profile.min_ping}~{profile.max_ping}坪\n租屋類型:{'、'.join(KINDS_TABLE[k] for k in profile.kinds)}\n更新物件: {profile.new_within_hours}小時內\n開始爬蟲...\n-----------------------"""
+
+def dry_run():
+    """
+    Load everything a run would, then stop before the first request.
+
+    Resolves the profiles and search URLs, imports the selected engine,
+    fetch backend and parser, and prints what would be crawled. Nothing is
+    fetched, pushed or written.
+    """
+    from app.crawler import generate_urls
+    from app.libs.fetchers import BACKEND_MODULES
+    from app.libs.parsing import parse_html
+
+    profiles = load_profiles()
+    load_engine(CRAWL_ENGINE)
+    for module in BACKEND_MODULES.get(FETCH_BACKEND, ()):
+        import_module(module)
+    if SEND_LINE_MESSAGE:
+        import_module("requests")
+    parse_html("<div class=\"item\"></div>")
+    urls = generate_urls(profiles)
+
+    print(f"[DryRun] Startup took {(time.perf_counter() - STARTED) * 1000:.0f}ms")
+    print(f"[DryRun] Engine: {CRAWL_ENGINE}, fetch backend: {FETCH_BACKEND}, parser: {PARSER_ENGINE}")
+    for profile in profiles:
+        print(f"[DryRun] Profile {profile.name}: {'own' if profile.line_to else 'default'} LINE recipient")
+    print(f"[DryRun] {len(urls)} search URLs:")
+    for url in urls:
+        print(f"  {url}")
+
 def main():
-    start_message = f"""現在時間: {datetime.now(ZoneInfo("Asia/Taipei")).strftime("%Y-%m-%d %H:%M")}\n搜尋模式: {SEARCH_MODE_TABLE[SEARCH_MODE]}\n租金區間: {RENT_RANGE[0]}~{RENT_RANGE[1]}元\n坪數: {MIN_PING}~{MAX_PING}坪\n租屋類型:{'、'.join(KINDS_TABLE[k] for k in KINDS)}\n更新物件: {NEW_WITHIN_HOURS}小時內\n開始爬蟲...\n-----------------------"""
     end_message = "-----------------------\n爬蟲結束，請查看租屋資訊！"
 
-    items = run_crawler()
-    message = concat_items(items)
-    push_to_line(start_message + "\n" + message + "\n" + end_message)
+    metrics.reset()
+    profiles = load_profiles()
+    run_engine, stream_engine = load_engine(CRAWL_ENGINE)
+    # First-page fingerprints are only kept for searches whose listings all got delivered
+    cache = PageCache() if INCREMENTAL_CRAWL else None
+    missed_searches = set()
+    with PeakMemory(release=LOW_MEMORY):
+        if STREAM_NOTIFICATIONS:
+            # Push new listings in small batches while later pages are still being crawled
+            listings = stream_engine(cache=cache)
+            if LISTING_HISTORY:
+                listings = record_history(listings)
+            crawled = stream_to_line(listings, profiles, build_start_message, end_message, missed_searches=missed_searches)
+        else:
+            items = run_engine(cache=cache)
+            crawled = items is not None
+            if LISTING_HISTORY:
+                save_history(items)
+
+            # Every page was fetched once, each profile picks its own listings out of it
+            for profile in profiles:
+                push_new_listings(
+                    profile.select(items), profile.name, recipient=profile.line_to,
+                    header=build_start_message(profile), footer=end_message, limit=profile.top_n,
+                    missed_searches=missed_searches,
+                )
+    settle_page_cache(cache, crawled, missed_searches)
 
+    metrics.write_report()
     print("[Crawler] Finished.")
 
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl 591 once and push new listings to LINE")
+    parser.add_argument("--dry-run", action="store_true", help="Load config, profiles and the selected engine, list the search URLs, then exit")
+    parser.add_argument("--profile-startup", action="store_true", help="Report import time per module for a --dry-run in a fresh interpreter")
+    args = parser.parse_args(argv)
+
+    if args.profile_startup:
+        from app.libs.startup import import_times, print_import_report
+
+        modules, returncode = import_times([__file__, "--dry-run"])
+        print()
+        print_import_report(modules)
+        return returncode
+
+    load_env()
+    if args.dry_run:
+        dry_run()
+    else:
+        main()
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
@@ -0,0 +1,79 @@
+from app.libs.job_queue import SQLiteJobQueue
+
+URL = "https://rent.591.com.tw/list?region=1"
+
+
+def make_queue(tmp_path, max_attempts=3):
+    return SQLiteJobQueue(path=str(tmp_path / "jobs.db"), max_attempts=max_attempts)
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path)
+    run_id = queue.start_run([URL])
+
+    # A negative lease has already run out, as if the worker died holding it
+    first = queue.claim("worker-a", lease_seconds=-1)
+    second = queue.claim("worker-b", lease_seconds=60)
+
+    assert second["id"] == first["id"]
+    assert second["attempts"] == 2
+    assert queue.summary(run_id) == {"leased": 1}
+    queue.close()
+
+
+def test_complete_after_lost_lease_is_dropped(tmp_path):
+    queue = make_queue(tmp_path)
+    run_id = queue.start_run([URL])
+
+    stale = queue.claim("worker-a", lease_seconds=-1)
+    fresh = queue.claim("worker-b", lease_seconds=60)
+
+    assert queue.complete(stale, "worker-a", [], has_next=True) is False
+    assert queue.summary(run_id) == {"leased": 1}
+
+    assert queue.complete(fresh, "worker-b", [], has_next=False) is True
+    assert queue.summary(run_id) == {"done": 1}
+    assert queue.is_finished(run_id)
+    queue.close()
+
+
+def test_job_fails_once_attempts_are_exhausted(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    run_id = queue.start_run([URL])
+
+    for worker in ("worker-a", "worker-b"):
+        job = queue.claim(worker, lease_seconds=60)
+        queue.fail(job, worker)
+
+    assert queue.summary(run_id) == {"failed": 1}
+    assert queue.claim("worker-c", lease_seconds=60) is None
+    assert queue.is_finished(run_id)
+    queue.close()
+
+
+def test_job_fails_when_last_worker_dies_holding_the_lease(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    run_id = queue.start_run([URL])
+
+    queue.claim("worker-a", lease_seconds=-1)
+    queue.claim("worker-b", lease_seconds=-1)
+
+    assert queue.claim("worker-c", lease_seconds=60) is None
+    assert queue.summary(run_id) == {"failed": 1}
+    queue.close()
+
+
+def test_cancelled_run_is_not_claimed_again(tmp_path):
+    queue = make_queue(tmp_path)
+    old_run = queue.start_run([URL, URL + "&kind=2"])
+    leased = queue.claim("worker-a", lease_seconds=-1)
+
+    assert queue.cancel(old_run) == 2
+    assert queue.is_finished(old_run)
+    assert queue.complete(leased, "worker-a", [], has_next=True) is False
+
+    new_run = queue.start_run([URL])
+    job = queue.claim("worker-b", lease_seconds=60)
+    assert job["run_id"] == new_run
+    assert queue.summary(old_run) == {"cancelled": 2}
+    queue.close()
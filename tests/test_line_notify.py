@@ -0,0 +1,36 @@
+from app.line_notify import pack_chunks, split_oversized, utf16_len, _hard_split
+
+EMOJI = "\U0001F3E0"  # outside the BMP, two UTF-16 code units
+
+
+def test_hard_split_keeps_surrogate_pairs_whole():
+    # The first pair would straddle the limit, so it moves to the next piece
+    pieces = _hard_split("aaa" + EMOJI * 3, max_units=4)
+
+    assert [piece for piece, _ in pieces] == ["aaa", EMOJI * 2, EMOJI]
+    assert all(units == utf16_len(piece) <= 4 for piece, units in pieces)
+
+
+def test_oversized_entry_is_split_at_line_breaks():
+    entry = "\n".join(["x" * 4, "y" * 4, "z" * 12])
+    pieces = split_oversized(entry, max_units=10)
+
+    assert [piece for piece, _ in pieces] == ["xxxx\nyyyy", "z" * 10, "zz"]
+    assert all(units == utf16_len(piece) <= 10 for piece, units in pieces)
+
+
+def test_chunks_stay_within_the_limit():
+    entries = ["header", "a" * 7, EMOJI * 9, "b\n" + "c" * 30, "footer"]
+    chunks, _ = pack_chunks(entries, max_units=12)
+
+    assert all(utf16_len(chunk) <= 12 for chunk in chunks)
+    # Nothing but separators is lost
+    assert "".join(chunks).replace("\n", "") == "".join(entries).replace("\n", "")
+
+
+def test_owners_name_every_entry_with_text_in_a_chunk():
+    entries = ["head", "", "a" * 25, "tail"]
+    chunks, owners = pack_chunks(entries, max_units=10, separator="\n")
+
+    assert chunks == ["head", "a" * 10, "a" * 10, "aaaaa\ntail"]
+    assert owners == [{0}, {2}, {2}, {2, 3}]
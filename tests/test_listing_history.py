@@ -0,0 +1,20 @@
+from app.libs.listing import Listing
+from app.libs.listing_history import ListingHistory
+
+
+def make_listing(price):
+    return Listing(1, "套房", "https://rent.591.com.tw/1", price=price, ping=8.0, address="台北市大安區")
+
+
+def test_seen_count_goes_up_once_per_run(tmp_path):
+    with ListingHistory(path=str(tmp_path / "listing_history.db")) as history:
+        # Found on two pages of the first run, in separate batches
+        history.upsert_many([make_listing(12000)], seen_at=1000)
+        history.upsert_many([make_listing(12000), make_listing(12000)], seen_at=1000)
+        assert history.get(1)["seen_count"] == 1
+
+        history.upsert_many([make_listing(11000)], seen_at=2000)
+        row = history.get(1)
+        assert row["seen_count"] == 2
+        assert (row["first_price"], row["last_price"]) == (12000, 11000)
+        assert history.price_history(1) == [(12000, 11000, 2000)]
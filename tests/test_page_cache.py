@@ -0,0 +1,43 @@
+from app.libs.page_cache import PageCache
+
+URL_A = "https://rent.591.com.tw/list?region=1"
+URL_B = "https://rent.591.com.tw/list?region=3"
+
+
+def make_cache(tmp_path):
+    return PageCache(path=str(tmp_path / "page_cache.json"))
+
+
+def test_changed_fingerprint_is_only_saved_after_commit(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.update(URL_A, "abc")
+    cache.save()
+
+    assert make_cache(tmp_path).get(URL_A) is None
+
+    cache.commit()
+    cache.save()
+    assert make_cache(tmp_path).get(URL_A)["fingerprint"] == "abc"
+
+
+def test_commit_drops_searches_with_undelivered_listings(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.update(URL_A, "old")
+    cache.commit()
+
+    cache.update(URL_A, "new")
+    cache.update(URL_B, "new")
+    assert cache.commit(exclude={URL_A}) == 1
+
+    # The old entry goes too, so the next run crawls the search in full
+    assert cache.get(URL_A) is None
+    assert cache.get(URL_B)["fingerprint"] == "new"
+
+
+def test_discarded_search_is_not_committed(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.update(URL_A, "abc")
+    cache.discard(URL_A)
+
+    assert cache.commit() == 0
+    assert cache.get(URL_A) is None
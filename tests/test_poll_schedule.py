@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from app.libs.listing import Listing
+from app.libs.poll_schedule import PollSchedule, TIMEZONE
+from app.libs.profiles import Profile
+
+URL_A = "https://rent.591.com.tw/list?metro=100&station=4190&kind=1"
+URL_B = "https://rent.591.com.tw/list?metro=148&station=4248&kind=1"
+URL_C = "https://rent.591.com.tw/list?metro=148&station=4250&kind=1"
+URL_D = "https://rent.591.com.tw/list?metro=100&station=4191&kind=1"
+
+MIDNIGHT = datetime(2026, 1, 5, tzinfo=TIMEZONE).timestamp()
+
+
+def make_schedule(tmp_path, profiles=None, **kwargs):
+    return PollSchedule(path=str(tmp_path / "poll_schedule.json"), profiles=profiles or [Profile("default")], **kwargs)
+
+
+def test_interval_spends_the_daily_budget(tmp_path):
+    schedule = make_schedule(tmp_path, daily_budget=100, min_interval=1, max_interval=10 ** 9)
+    schedule.searches = {
+        URL_A: {"rates": [4.0] * 24, "pages": 2.0, "last_polled": None},
+        URL_B: {"rates": [1.0] * 24, "pages": 1.0, "last_polled": None},
+    }
+    urls = [URL_A, URL_B]
+
+    page_loads = sum(
+        3600 / schedule.interval(url, urls, MIDNIGHT + hour * 3600 + 1800) * schedule.pages(url)
+        for url in urls for hour in range(24)
+    )
+    assert abs(page_loads - 100) < 1e-6
+    # Four times the arrivals at twice the cost is still worth polling more often
+    assert schedule.interval(URL_A, urls, MIDNIGHT) < schedule.interval(URL_B, urls, MIDNIGHT)
+
+
+def test_due_stays_within_what_is_left_of_the_budget(tmp_path):
+    schedule = make_schedule(tmp_path, daily_budget=10, min_interval=60, max_interval=3600)
+    now = MIDNIGHT + 12 * 3600
+    schedule.searches = {
+        URL_A: {"rates": [None] * 24, "pages": 3.0, "last_polled": now - 10 * 86400},
+        URL_B: {"rates": [None] * 24, "pages": 3.0, "last_polled": now - 5 * 86400},
+        URL_D: {"rates": [None] * 24, "pages": 1.0, "last_polled": now},
+    }
+    schedule._roll_day(now)
+    schedule.spent = 5
+
+    # Never polled comes first, then the most overdue; B no longer fits and D is not due
+    assert schedule.due([URL_A, URL_B, URL_C, URL_D], now) == [URL_C, URL_A]
+
+
+def test_rates_are_learned_over_the_window_of_the_profiles_served(tmp_path):
+    profiles = [
+        Profile("short", areas={"100": ["4190", "4191"]}, new_within_hours=2),
+        Profile("long", areas={"148": ["4248", "4250"]}, new_within_hours=48),
+    ]
+    schedule = make_schedule(tmp_path, profiles=profiles)
+    polled_at = MIDNIGHT + 12 * 3600 + 1800
+    listings = [
+        Listing(1, "t", "l", age_minutes=10 * 60, source_urls=[URL_A]),
+        Listing(2, "t", "l", age_minutes=10 * 60, source_urls=[URL_B]),
+    ]
+
+    schedule.record([URL_A, URL_B], listings, polled_at)
+
+    # URL_A only looks 2 hours back from 12:30, so the listing posted at 02:30 tells it nothing
+    rates_a = schedule.searches[URL_A]["rates"]
+    assert [hour for hour in range(24) if rates_a[hour] is not None] == [10, 11, 12]
+
+    rates_b = schedule.searches[URL_B]["rates"]
+    assert None not in rates_b
+    assert rates_b[2] > rates_b[3]
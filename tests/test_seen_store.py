@@ -0,0 +1,44 @@
+import json
+import time
+
+from app.libs.seen_store import SeenStore
+
+
+def make_store(tmp_path, ttl_days=30, legacy_ids=None):
+    legacy_file = tmp_path / "pushed_items.json"
+    if legacy_ids is not None:
+        legacy_file.write_text(json.dumps({"pushed_ids": legacy_ids}), encoding="utf-8")
+    return SeenStore(path=str(tmp_path / "seen_items.db"), ttl_days=ttl_days, legacy_file=str(legacy_file))
+
+
+def test_legacy_file_is_migrated_once(tmp_path):
+    with make_store(tmp_path, legacy_ids=["101", 102, "not-an-id"]) as store:
+        assert store.ids() == {101, 102}
+        store.add_many([103])
+
+    # Reopening must not import the file again, even if it changed meanwhile
+    with make_store(tmp_path, legacy_ids=["104"]) as store:
+        assert store.ids() == {101, 102, 103}
+
+
+def test_ids_older_than_ttl_are_expired(tmp_path):
+    with make_store(tmp_path, ttl_days=1) as store:
+        store.add_many([1, 2])
+        old = int(time.time()) - 2 * 86400
+        store.conn.execute("UPDATE seen SET seen_at = ? WHERE id = 1", (old,))
+        store.conn.commit()
+
+        assert store.expire() == 1
+        assert store.ids() == {2}
+
+
+def test_scopes_are_isolated(tmp_path):
+    with make_store(tmp_path) as store:
+        store.add_many([1, 2], scope="alice")
+        store.add_many([2, 3], scope="bob")
+
+        assert store.contains(1, scope="alice")
+        assert not store.contains(1, scope="bob")
+        assert store.filter_new([1, 2, 3, 4], scope="alice") == [3, 4]
+        assert store.ids("bob") == {2, 3}
+        assert store.ids() == {1, 2, 3}